@@ -6,8 +6,9 @@ function App() {
   const [messages, setMessages] = useState([]);
   const [inputText, setInputText] = useState('');
   const [attachedImage, setAttachedImage] = useState(null);
+  const [attachedImageFile, setAttachedImageFile] = useState(null);
   const [attachedPdf, setAttachedPdf] = useState(null);
-  const [pdfText, setPdfText] = useState('');
+  const [documentId, setDocumentId] = useState('');
   const [pdfName, setPdfName] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [sessionId, setSessionId] = useState(null);
@@ -82,7 +83,7 @@ function App() {
     setSessionId(newChatId);
     setMessages([]);
     setIsPdfMode(false);
-    setPdfText('');
+    setDocumentId('');
     setPdfName('');
     setAttachedPdf(null);
     setSelectedModel('llama3.2-vision');
@@ -267,12 +268,12 @@ function App() {
 
     try {
       // Different handling based on mode
-      if (isPdfMode && pdfText) {
+      if (isPdfMode && documentId) {
         // PDF discussion mode
         await handlePdfQuestion(inputText);
       } else {
         // Regular chat mode
-        await handleRegularChat(inputText, attachedImage);
+        await handleRegularChat(inputText, attachedImageFile);
       }
     } catch (error) {
       console.error('Error sending message:', error);
@@ -297,102 +298,109 @@ function App() {
       // Clear input and image after sending
       setInputText('');
       setAttachedImage(null);
+      setAttachedImageFile(null);
       setIsLoading(false);
     }
   };
 
-  // Handle regular chat mode
-  const handleRegularChat = async (text, image) => {
-    // Prepare request data
-    const requestData = {
-      text: text,
-      sessionId: sessionId,
-      model: selectedModel
-    };
-
-    // Add image if present
-    if (image) {
-      requestData.image = image;
-    }
-
-    // Send request to backend
-    const response = await fetch('http://localhost:5000/api/chat', {
+  // Stream a bot response from an NDJSON endpoint, updating the message as tokens arrive
+  const streamBotResponse = async (url, requestData) => {
+    // FormData bodies (image uploads) set their own multipart Content-Type
+    const isFormData = requestData instanceof FormData;
+    const response = await fetch(url, {
       method: 'POST',
-      headers: {
+      headers: isFormData ? {} : {
         'Content-Type': 'application/json',
       },
-      body: JSON.stringify(requestData),
+      body: isFormData ? requestData : JSON.stringify(requestData),
     });
 
     if (!response.ok) {
       throw new Error('Network response was not ok');
     }
 
-    const data = await response.json();
-
-    // Display bot response
-    const botResponse = {
-      id: Date.now() + 1,
-      text: data.response,
-      sender: 'bot',
-    };
-    
-    const updatedMessages = [...messages, botResponse];
-    setMessages(updatedMessages);
-    
-    if (currentChat) {
-      setCurrentChat(prevChat => ({
+    // Add an empty bot message that fills in as tokens stream in
+    const botId = Date.now() + 1;
+    const updateBotText = (update) => {
+      const apply = (prevMessages) => prevMessages.map(message =>
+        message.id === botId ? { ...message, text: update(message.text) } : message
+      );
+      setMessages(apply);
+      setCurrentChat(prevChat => prevChat && ({
         ...prevChat,
-        messages: updatedMessages
+        messages: apply(prevChat.messages)
       }));
+    };
+
+    setMessages(prevMessages => [...prevMessages, { id: botId, text: '', sender: 'bot' }]);
+    setCurrentChat(prevChat => prevChat && ({
+      ...prevChat,
+      messages: [...prevChat.messages, { id: botId, text: '', sender: 'bot' }]
+    }));
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const event = JSON.parse(line);
+
+        if (event.type === 'token') {
+          updateBotText(text => text + event.content);
+        } else if (event.type === 'done' || event.type === 'error') {
+          updateBotText(() => event.response);
+        }
+      }
     }
   };
 
-  // Handle PDF analysis questions
-  const handlePdfQuestion = async (question) => {
+  // Handle regular chat mode
+  const handleRegularChat = async (text, image) => {
+    // Prepare request data
     const requestData = {
-      text: question,
-      pdfText: pdfText,
-      model: "mistral:latest" // Using Mistral for PDF analysis
+      text: text,
+      sessionId: sessionId,
+      model: selectedModel
     };
 
-    // Send request to backend
-    const response = await fetch('http://localhost:5000/api/pdf_question', {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify(requestData),
-    });
-
-    if (!response.ok) {
-      throw new Error('Network response was not ok');
+    // Send images as a binary multipart part rather than a base64 data URL
+    if (image) {
+      const formData = new FormData();
+      Object.entries(requestData).forEach(([key, value]) => formData.append(key, value));
+      formData.append('image', image);
+      await streamBotResponse('http://localhost:5000/api/chat/stream', formData);
+      return;
     }
 
-    const data = await response.json();
+    await streamBotResponse('http://localhost:5000/api/chat/stream', requestData);
+  };
 
-    // Display bot response
-    const botResponse = {
-      id: Date.now() + 1,
-      text: data.response,
-      sender: 'bot',
+  // Handle PDF analysis questions
+  const handlePdfQuestion = async (question) => {
+    const requestData = {
+      text: question,
+      documentId: documentId,
+      model: "mistral:latest" // Using Mistral for PDF analysis
     };
-    
-    const updatedMessages = [...messages, botResponse];
-    setMessages(updatedMessages);
-    
-    if (currentChat) {
-      setCurrentChat(prevChat => ({
-        ...prevChat,
-        messages: updatedMessages
-      }));
-    }
+
+    await streamBotResponse('http://localhost:5000/api/pdf_question/stream', requestData);
   };
 
   // Handle image upload
   const handleImageUpload = (e) => {
     const file = e.target.files[0];
     if (file) {
+      // Keep the file itself for the upload; the data URL is only for the preview
+      setAttachedImageFile(file);
       const reader = new FileReader();
       reader.onload = (event) => {
         setAttachedImage(event.target.result);
@@ -401,6 +409,26 @@ function App() {
     }
   };
 
+// Poll a background job until it finishes and return its result
+const waitForJob = async (jobId) => {
+  while (true) {
+    const response = await fetch(`http://localhost:5000/api/jobs/${jobId}`);
+    if (!response.ok) {
+      throw new Error('Failed to check PDF processing status');
+    }
+    
+    const job = await response.json();
+    if (job.status === 'done') {
+      return job.result;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'PDF processing failed');
+    }
+    
+    await new Promise(resolve => setTimeout(resolve, 1000));
+  }
+};
+
 // Modified handlePdfUpload function to automatically switch to Mistral
 const handlePdfUpload = async (e) => {
   const file = e.target.files[0];
@@ -428,14 +456,18 @@ const handlePdfUpload = async (e) => {
       throw new Error('Failed to upload PDF');
     }
     
-    const data = await response.json();
+    // Extraction and analysis run as a background job on the server
+    const job = await response.json();
     
-    // Store the extracted text
-    setPdfText(data.text);
+    // Store the server-side document id (the text stays on the server);
+    // questions can be asked about the pages extracted so far while the job runs
+    setDocumentId(job.documentId);
     
     // Switch to PDF mode
     setIsPdfMode(true);
     
+    const data = await waitForJob(job.jobId);
+    
     // Update current chat with Mistral model
     if (currentChat) {
       setCurrentChat(prevChat => ({
@@ -460,15 +492,12 @@ const handlePdfUpload = async (e) => {
       sender: 'bot',
     };
     
-    const updatedMessages = [...messages, systemMessage, analysisMessage];
-    setMessages(updatedMessages);
-    
-    if (currentChat) {
-      setCurrentChat(prevChat => ({
-        ...prevChat,
-        messages: updatedMessages
-      }));
-    }
+    // The job can take minutes; append to the messages as they are now, not as they were at upload
+    setMessages(prevMessages => [...prevMessages, systemMessage, analysisMessage]);
+    setCurrentChat(prevChat => prevChat && ({
+      ...prevChat,
+      messages: [...prevChat.messages, systemMessage, analysisMessage]
+    }));
     
   } catch (error) {
     console.error('Error uploading PDF:', error);
@@ -480,15 +509,11 @@ const handlePdfUpload = async (e) => {
       sender: 'bot',
     };
     
-    const updatedMessages = [...messages, errorMessage];
-    setMessages(updatedMessages);
-    
-    if (currentChat) {
-      setCurrentChat(prevChat => ({
-        ...prevChat,
-        messages: updatedMessages
-      }));
-    }
+    setMessages(prevMessages => [...prevMessages, errorMessage]);
+    setCurrentChat(prevChat => prevChat && ({
+      ...prevChat,
+      messages: [...prevChat.messages, errorMessage]
+    }));
   } finally {
     setProcessingPdf(false);
   }
@@ -523,7 +548,7 @@ const handlePdfUpload = async (e) => {
   // Exit PDF mode
   const exitPdfMode = () => {
     setIsPdfMode(false);
-    setPdfText('');
+    setDocumentId('');
     setPdfName('');
     setAttachedPdf(null);
     
@@ -963,7 +988,7 @@ const handlePdfUpload = async (e) => {
             <div className="mt-2 relative inline-block">
               <img src={attachedImage} alt="Attached" className="h-16 rounded" />
               <button
-                onClick={() => setAttachedImage(null)}
+                onClick={() => { setAttachedImage(null); setAttachedImageFile(null); }}
                 className="absolute -top-2 -right-2 bg-red-500 text-white rounded-full p-1 hover:bg-red-600"
               >
                 <svg xmlns="http://www.w3.org/2000/svg" className="h-3 w-3" fill="none" viewBox="0 0 24 24" stroke="currentColor">
@@ -0,0 +1,397 @@
+"""Asyncio (ASGI) serving mode for the chatbot API.
+
+Exposes the same routes as the Flask app in flask_server.py, but Ollama generations
+are awaited on a single pooled HTTP client instead of each one blocking a
+worker, so one process can hold hundreds of chats open at once. Session
+state, documents and request validation are shared with flask_server.py.
+
+Run with:  python async_server.py --port 5000
+      or:  hypercorn async_server:app --bind 127.0.0.1:5000
+"""
+import json
+import time
+import asyncio
+import argparse
+import logging
+from contextlib import asynccontextmanager
+
+from quart import Quart, Response, g, request, jsonify
+from quart_cors import cors
+
+import metrics
+import tracing
+import flask_server
+from response_cache import chat_key
+from document_store import store_upload
+from ollama_client import OllamaError, create_client
+from scheduler import Overloaded
+
+logger = logging.getLogger(__name__)
+
+app = cors(Quart(__name__))
+
+# Upper bound on simultaneous connections to Ollama from this process
+MAX_OLLAMA_CONNECTIONS = 500
+
+# One async client per Ollama host; the host for each request is picked by flask_server.ollama_client
+ollama_clients = {}
+
+
+@app.before_serving
+async def create_flask_state():
+    # Routes, stores and queues are shared with the Flask app
+    flask_server.create_app()
+
+
+@app.before_serving
+async def create_ollama_clients():
+    for backend in flask_server.ollama_client.backends:
+        ollama_clients[backend.host] = create_client(
+            flask_server.OLLAMA_CLIENT, backend.host, asynchronous=True, timeout=flask_server.OLLAMA_TIMEOUT, retries=flask_server.OLLAMA_RETRIES,
+            max_connections=MAX_OLLAMA_CONNECTIONS
+        )
+
+
+@app.after_serving
+async def close_ollama_clients():
+    for client in ollama_clients.values():
+        await client.aclose()
+
+
+@app.before_request
+async def start_request_trace():
+    g.request_started = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else request.path
+    g.trace = tracing.begin(f"{request.method} {route}",
+                            trace_id=tracing.valid_trace_id(request.headers.get(tracing.TRACE_HEADER)))
+
+
+@app.after_request
+async def finish_request_trace(response):
+    """Same histogram and traces as the Flask app, but streamed responses end when their headers are sent.
+
+    Per-request profiling is not offered here: a profiler on the event loop
+    thread would record every request in flight, not just this one.
+    """
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        flask_server.REQUEST_SECONDS.observe(time.perf_counter() - started, route=route,
+                                             method=request.method, status=response.status_code)
+        g.trace.set(status=response.status_code)
+        response.headers[tracing.TRACE_HEADER] = g.trace.trace.trace_id
+        tracing.end(g.trace)
+    return response
+
+
+async def routed_chat(model_name, messages, affinity=None, stream=False):
+    """Send a chat request to the Ollama host the backend pool picks for it."""
+    pool = flask_server.ollama_client
+    backend = pool.checkout(model_name, affinity)
+    error = response = None
+    handed_off = False
+    try:
+        response = await ollama_clients[backend.host].chat(model=model_name, messages=messages, stream=stream,
+                                                           keep_alive=flask_server.MODEL_KEEP_ALIVE)
+        if not stream:
+            return response
+        handed_off = True
+        return release_when_done(pool, backend, model_name, response)
+    except OllamaError as e:
+        error = e
+        raise
+    finally:
+        # Always give the backend back (also on cancellation), unless a stream now owns it
+        if not handed_off:
+            pool.release(backend, model_name, error, response)
+
+
+@asynccontextmanager
+async def scheduler_slot(model_name, session=None):
+    """Async counterpart of flask_server.request_scheduler.slot: waits for a slot without blocking the loop."""
+    scheduler = flask_server.request_scheduler
+    loop = asyncio.get_running_loop()
+    granted = loop.create_future()
+    ticket = scheduler.submit(model_name, session)
+
+    def grant():
+        if not granted.done():   # not already given up on
+            granted.set_result(None)
+
+    ticket.on_grant(lambda: loop.call_soon_threadsafe(grant))
+    try:
+        try:
+            await asyncio.wait_for(granted, scheduler.max_wait)
+        except asyncio.TimeoutError:
+            raise Overloaded(f"Model {model_name} is busy", scheduler.retry_after(model_name))
+        yield ticket
+    finally:
+        ticket.release()
+
+
+async def release_when_done(pool, backend, model_name, chunks):
+    error = last = None
+    try:
+        async for last in chunks:
+            yield last
+    except OllamaError as e:
+        error = e
+        raise
+    finally:
+        pool.release(backend, model_name, error, last)
+
+
+def error_response(error):
+    payload, status_code = error
+    headers = {'Retry-After': str(payload['retryAfter'])} if 'retryAfter' in payload else {}
+    return jsonify(payload), status_code, headers
+
+
+def ndjson_response(events):
+    return Response(events, mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+async def read_chat_request():
+    """Async counterpart of flask_server.read_chat_request."""
+    if request.mimetype == 'multipart/form-data':
+        form = await request.form
+        image = (await request.files).get('image')
+        return form.to_dict(), (image.stream if image else None)
+    return await request.get_json(), None
+
+
+async def cached_chat(model_name, messages, cache_key=None, affinity=None):
+    """Async counterpart of flask_server.cached_chat; returns the assistant message."""
+    cache = flask_server.response_cache
+    cache_key = cache_key or chat_key(model_name, messages)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return {'role': 'assistant', 'content': cached}
+
+    async with scheduler_slot(model_name, affinity):
+        response = await routed_chat(model_name, messages, affinity)
+    message = {'role': 'assistant', 'content': response['message']['content']}
+    if message['content']:
+        cache.put(cache_key, message['content'])
+    return message
+
+
+async def stream_ollama_chat(model_name, messages, on_complete=None, cache_key=None, affinity=None, **extra):
+    """Async counterpart of flask_server.stream_ollama_chat; emits the same NDJSON events."""
+    start_time = time.time()
+    time_to_first_token = None
+    parts = []
+    cache = flask_server.response_cache
+    cache_key = cache_key or chat_key(model_name, messages)
+
+    yield json.dumps(dict(extra, type='start')) + "\n"
+
+    cached = cache.get(cache_key)
+    if cached is not None:
+        if on_complete:
+            on_complete({'role': 'assistant', 'content': cached})
+        yield json.dumps({'type': 'token', 'content': cached}) + "\n"
+        elapsed = time.time() - start_time
+        yield json.dumps(dict(extra, type='done', response=cached, cached=True,
+                              timeToFirstToken=elapsed, totalTime=elapsed)) + "\n"
+        return
+
+    try:
+        with tracing.span('generation', model=model_name, stream=True):
+            async with scheduler_slot(model_name, affinity):
+                async for chunk in await routed_chat(model_name, messages, affinity, stream=True):
+                    content = chunk['message']['content']
+                    if not content:
+                        continue
+                    if time_to_first_token is None:
+                        time_to_first_token = time.time() - start_time
+                        flask_server.OLLAMA_TTFT_SECONDS.observe(time_to_first_token, model=model_name)
+                    parts.append(content)
+                    yield json.dumps({'type': 'token', 'content': content}) + "\n"
+
+        message = {'role': 'assistant', 'content': "".join(parts)}
+        if on_complete:
+            on_complete(message)
+        if message['content']:
+            cache.put(cache_key, message['content'])
+        flask_server.model_health.mark_working(model_name)
+
+        yield json.dumps(dict(extra,
+            type='done',
+            response=message['content'],
+            timeToFirstToken=time_to_first_token,
+            totalTime=time.time() - start_time
+        )) + "\n"
+    except Overloaded as e:
+        payload, _ = flask_server.overloaded_error(e)
+        yield json.dumps(dict(extra, type='error', **payload)) + "\n"
+    except Exception as e:
+        logger.error(f"Error from Ollama: {e}")
+        message, _ = flask_server.describe_ollama_error(model_name, str(e))
+        yield json.dumps(dict(extra, type='error', response=message)) + "\n"
+
+
+@app.route('/api/status', methods=['GET'])
+async def status():
+    return jsonify(flask_server.get_status_payload())
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/api/chat', methods=['POST'])
+async def chat():
+    data, image_stream = await read_chat_request()
+    session_id, model_name, error = await asyncio.to_thread(flask_server.prepare_chat_request, data, image_stream)
+    if error:
+        return error_response(error)
+
+    history = flask_server.chat_histories
+    try:
+        messages = flask_server.chat_messages(session_id)
+        message = await cached_chat(model_name, messages, affinity=session_id)
+        flask_server.model_health.mark_working(model_name)
+        history.append(session_id, message)
+        return jsonify({'sessionId': session_id, 'response': message['content']})
+    except Overloaded as e:
+        return error_response(flask_server.overloaded_error(e, sessionId=session_id))
+    except Exception as e:
+        logger.error(f"Error from Ollama: {e}")
+        message, status_code = flask_server.describe_ollama_error(model_name, str(e))
+        return jsonify({'sessionId': session_id, 'response': message}), status_code
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+async def chat_stream():
+    data, image_stream = await read_chat_request()
+    session_id, model_name, error = await asyncio.to_thread(flask_server.prepare_chat_request, data, image_stream)
+    if error:
+        return error_response(error)
+
+    history = flask_server.chat_histories
+    return ndjson_response(stream_ollama_chat(
+        model_name, flask_server.chat_messages(session_id),
+        on_complete=lambda message: history.append(session_id, message),
+        affinity=session_id,
+        sessionId=session_id
+    ))
+
+
+@app.route('/api/upload_pdf', methods=['POST'])
+async def upload_pdf():
+    if not flask_server.ollama_health.allow():
+        return error_response(flask_server.unavailable_error('error'))
+
+    flask_server.model_residency.warm(flask_server.ANALYSIS_MODEL, 'PDF upload')
+
+    files = await request.files
+    if 'pdf' not in files:
+        return jsonify({'error': 'No PDF file provided'}), 400
+
+    pdf_file = files['pdf']
+    if pdf_file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    if not pdf_file.filename.lower().endswith('.pdf'):
+        return jsonify({'error': 'File does not appear to be a PDF'}), 400
+
+    try:
+        with flask_server.stage('pdf_store'):
+            document_id, pdf_path, is_new = await asyncio.to_thread(
+                store_upload, pdf_file.stream, flask_server.PDF_FOLDER
+            )
+        logger.info(f"PDF {'saved to' if is_new else 'already stored as'} {pdf_path}")
+
+        # Extraction and the analysis run on the shared background job queue
+        payload, status_code = await asyncio.to_thread(
+            flask_server.submit_pdf_job, pdf_path, pdf_file.filename, document_id
+        )
+        return jsonify(payload), status_code
+    except Exception as e:
+        logger.error(f"Error processing PDF: {e}")
+        return jsonify({'error': f"Error processing PDF: {str(e)}"}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+async def job_status(job_id):
+    payload = await asyncio.to_thread(flask_server.get_job_payload, job_id)
+    if payload is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(payload)
+
+
+@app.route('/api/documents/<document_id>/status', methods=['GET'])
+async def document_status(document_id):
+    payload = await asyncio.to_thread(flask_server.get_document_status, document_id)
+    if payload is None:
+        return jsonify({'error': 'Document not found'}), 404
+    return jsonify(payload)
+
+
+@app.route('/api/documents/<document_id>/pages/<int:page_number>', methods=['GET'])
+async def document_page(document_id, page_number):
+    payload = await asyncio.to_thread(flask_server.get_document_page, document_id, page_number)
+    if payload is None:
+        return jsonify({'error': 'Page not found'}), 404
+    return jsonify(payload)
+
+
+@app.route('/api/pdf_question', methods=['POST'])
+async def pdf_question():
+    data = await request.get_json()
+    model_name, prompt, error = await asyncio.to_thread(flask_server.prepare_pdf_question, data)
+    if error:
+        return error_response(error)
+
+    try:
+        message = await cached_chat(model_name, [{'role': 'user', 'content': prompt}],
+                                    cache_key=flask_server.pdf_cache_key(data, model_name),
+                                    affinity=data.get('documentId'))
+        flask_server.model_health.mark_working(model_name)
+        return jsonify({'response': message['content']})
+    except Overloaded as e:
+        return error_response(flask_server.overloaded_error(e))
+    except Exception as e:
+        logger.error(f"Error from Ollama: {e}")
+        message, status_code = flask_server.describe_ollama_error(model_name, str(e))
+        return jsonify({'response': message}), status_code
+
+
+@app.route('/api/pdf_question/stream', methods=['POST'])
+async def pdf_question_stream():
+    data = await request.get_json()
+    model_name, prompt, error = await asyncio.to_thread(flask_server.prepare_pdf_question, data)
+    if error:
+        return error_response(error)
+
+    return ndjson_response(stream_ollama_chat(
+        model_name, [{'role': 'user', 'content': prompt}], cache_key=flask_server.pdf_cache_key(data, model_name),
+        affinity=data.get('documentId')
+    ))
+
+
+@app.route('/api/reset', methods=['POST'])
+async def reset_chat():
+    data = await request.get_json()
+    session_id = data.get('sessionId')
+
+    if session_id and flask_server.chat_histories.reset(session_id):
+        flask_server.context_window.forget(session_id)
+        logger.info(f"Chat history reset for session {session_id}")
+        return jsonify({'status': 'Chat history reset successfully'})
+
+    return jsonify({'status': 'Session not found'}), 404
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the chatbot API as an asyncio server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+
+    logger.info(f"Async server is starting on http://{args.host}:{args.port}")
+    app.run(host=args.host, port=args.port)
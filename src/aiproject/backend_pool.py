@@ -0,0 +1,189 @@
+import threading
+import logging
+from collections import OrderedDict
+
+from ollama_client import OllamaError
+
+logger = logging.getLogger(__name__)
+
+
+def model_matches(model_name, names):
+    """True if model_name is among names, ignoring the tag like probe_ollama_service does."""
+    base_name = model_name.split(":")[0]
+    return model_name in names or any(base_name in name for name in names)
+
+
+class Backend:
+    """One Ollama host: its client, health, installed and loaded models, and load."""
+
+    def __init__(self, client):
+        self.client = client
+        self.host = client.host
+        self.healthy = True
+        self.error = None
+        self.models = None      # installed models; None until the first refresh
+        self.loaded = set()     # models resident in memory
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+
+    def has_model(self, model_name):
+        return self.models is None or model_matches(model_name, self.models)
+
+    def details(self):
+        return {
+            'host': self.host,
+            'healthy': self.healthy,
+            'error': self.error,
+            'models': sorted(self.models or ()),
+            'loaded': sorted(self.loaded),
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'failures': self.failures
+        }
+
+
+class BackendPool:
+    """Balances Ollama requests across several hosts; used like a single OllamaClient.
+
+    Each request goes to a healthy host that has the model installed,
+    preferring hosts where it is already loaded and then the fewest requests
+    in flight. Requests with an affinity key (e.g. a chat session) stick to
+    the host that served the key before, whose KV cache is warm, unless that
+    host is much busier than the others. Hosts that cannot be reached are
+    skipped until the next refresh, and the request is retried elsewhere.
+    on_response(host, model, response) is called with the final response
+    object of every successful generation.
+    """
+
+    def __init__(self, clients, affinity_slack=2, max_affinities=10000, on_response=None):
+        self.backends = [Backend(client) for client in clients]
+        self.affinity_slack = affinity_slack
+        self.max_affinities = max_affinities
+        self.on_response = on_response
+        self._affinity = OrderedDict()   # key -> Backend
+        self._lock = threading.Lock()
+
+    @property
+    def host(self):
+        return ",".join(backend.host for backend in self.backends)
+
+    def refresh(self, timeout=5):
+        """Re-check every host's health, installed and loaded models."""
+        for backend in self.backends:
+            try:
+                models = backend.client.tags(timeout=timeout)
+                loaded = backend.client.ps(timeout=timeout)
+            except OllamaError as e:
+                with self._lock:
+                    backend.healthy = False
+                    backend.error = str(e)
+                logger.warning(f"⚠️ Ollama host {backend.host} is unavailable: {e}")
+                continue
+            with self._lock:
+                backend.healthy = True
+                backend.error = None
+                backend.models = set(models)
+                backend.loaded = set(loaded)
+
+    def checkout(self, model_name, affinity=None, exclude=()):
+        """Pick the host for a request and count it as in flight; pair with release()."""
+        with self._lock:
+            available = [b for b in self.backends if b not in exclude]
+            if not available:
+                raise OllamaError("No Ollama host is available")
+            candidates = ([b for b in available if b.healthy and b.has_model(model_name)]
+                          or [b for b in available if b.healthy]
+                          or available)
+
+            backend = None
+            if affinity is not None:
+                sticky = self._affinity.get(affinity)
+                least = min(b.in_flight for b in candidates)
+                if sticky in candidates and sticky.in_flight <= least + self.affinity_slack:
+                    backend = sticky
+            if backend is None:
+                resident = [b for b in candidates if model_name in b.loaded]
+                backend = min(resident or candidates, key=lambda b: (b.in_flight, b.requests))
+
+            if affinity is not None:
+                self._affinity[affinity] = backend
+                self._affinity.move_to_end(affinity)
+                while len(self._affinity) > self.max_affinities:
+                    self._affinity.popitem(last=False)
+
+            backend.in_flight += 1
+            backend.requests += 1
+            return backend
+
+    def release(self, backend, model_name=None, error=None, response=None):
+        """Finish a request started with checkout(); unreachable hosts are marked unhealthy."""
+        with self._lock:
+            backend.in_flight -= 1
+            if error is not None:
+                backend.failures += 1
+                if getattr(error, 'status_code', None) is None:
+                    backend.healthy = False
+                    backend.error = str(error)
+                return
+            if model_name:
+                backend.loaded.add(model_name)
+        if self.on_response and model_name and isinstance(response, dict):
+            self.on_response(backend.host, model_name, response)
+
+    def _call(self, method, model, *args, affinity=None, stream=False, **kwargs):
+        tried = []
+        while True:
+            backend = self.checkout(model, affinity, exclude=tried)
+            try:
+                if stream:
+                    kwargs['stream'] = True
+                result = getattr(backend.client, method)(model, *args, **kwargs)
+            except OllamaError as e:
+                self.release(backend, model, e)
+                tried.append(backend)
+                # Only an unreachable host is worth retrying on another one
+                if e.status_code is not None or len(tried) == len(self.backends):
+                    raise
+                logger.warning(f"⚠️ Ollama host {backend.host} failed, trying another: {e}")
+                continue
+            if stream:
+                return self._streamed(backend, model, result)
+            self.release(backend, model, response=result)
+            return result
+
+    def _streamed(self, backend, model, chunks):
+        error = last = None
+        try:
+            for last in chunks:
+                yield last
+        except OllamaError as e:
+            error = e
+            raise
+        finally:
+            self.release(backend, model, error, last)
+
+    def tags(self, timeout=5):
+        """Refresh all hosts and return the models installed on any healthy one."""
+        self.refresh(timeout)
+        with self._lock:
+            healthy = [b for b in self.backends if b.healthy]
+            if not healthy:
+                raise OllamaError(f"No Ollama host is reachable ({self.host})")
+            return sorted(set().union(*(b.models for b in healthy)))
+
+    def chat(self, model, messages, affinity=None, **kwargs):
+        return self._call('chat', model, messages, affinity=affinity, **kwargs)
+
+    def generate(self, model, prompt, affinity=None, **kwargs):
+        return self._call('generate', model, prompt, affinity=affinity, **kwargs)
+
+    def embed(self, model, inputs, **kwargs):
+        return self._call('embed', model, inputs, **kwargs)
+
+    def load(self, model, **kwargs):
+        return self._call('load', model, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            return {'backends': [b.details() for b in self.backends], 'affinities': len(self._affinity)}
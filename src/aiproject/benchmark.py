@@ -0,0 +1,420 @@
+"""Reproducible benchmarks for the chatbot API, runnable offline.
+
+Every scenario runs against FakeOllamaServer, whose latency and token rate
+are set on the command line, and against synthetic PDFs generated from a
+fixed seed (kept in --corpus so they are only built once). Scenarios:
+
+  extraction    PDF extraction speed in-process: plain text serial and parallel, and structured
+  chat          concurrent /api/chat requests
+  upload        /api/upload_pdf throughput, from upload to finished analysis
+  pdf_question  /api/pdf_question latency and time to first streamed token
+
+Results are written as JSON with the commit they were measured on;
+--compare prints the change against an earlier results file.
+
+Run with:  python benchmark.py --scenarios chat,pdf_question --compare benchmark-abc1234.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_ollama import FakeOllamaServer
+from load_test import HERE, free_port, server_command, scheduler_env, wait_until_ready
+
+SCENARIOS = ['extraction', 'chat', 'upload', 'pdf_question']
+
+WORDS = (
+    "account agreement amount analysis annual approval asset audit balance board budget capital "
+    "clause client committee contract cost customer data delivery department deposit document "
+    "employee equipment estimate expense facility finance forecast fund growth income insurance "
+    "interest inventory invoice item liability license loan management market meeting method "
+    "network notice obligation operation order payment period policy premium price process "
+    "product profit project property purchase quality quarter rate record report request "
+    "revenue review risk salary schedule section service share statement strategy supplier "
+    "supply system tax term total transfer unit value vendor volume warranty"
+).split()
+
+
+# Synthetic corpus
+
+def page_text(rng, page_num, words_per_page):
+    """Deterministic page text: a heading, filler words and one fact a question can ask about."""
+    words = " ".join(rng.choice(WORDS) for _ in range(words_per_page))
+    day = 1 + page_num % 28
+    fact = f"Invoice {page_num} was issued on 2024-{1 + page_num % 12:02d}-{day:02d} for {rng.randint(100, 99999)} EUR."
+    return f"Section {page_num // 10 + 1}, page {page_num}\n\n{words}\n\n{fact}"
+
+
+def make_pdf(path, pages, seed=0, words_per_page=350):
+    """Write a PDF with the given number of text pages; the same seed gives the same text."""
+    import fitz  # PyMuPDF, already needed for extraction
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_num in range(1, pages + 1):
+        page = doc.new_page(width=595, height=842)
+        page.insert_textbox(fitz.Rect(50, 50, 545, 792), page_text(rng, page_num, words_per_page), fontsize=9)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def corpus_pdf(corpus, pages, seed=0):
+    """Path of the synthetic PDF with this many pages, generating it on first use."""
+    if not os.path.exists(corpus):
+        os.makedirs(corpus)
+    path = os.path.join(corpus, f"synthetic-{pages}p-seed{seed}.pdf")
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        make_pdf(path, pages, seed)
+        print(f"Generated {path} in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+# HTTP helpers
+
+def call(method, url, body=None, headers=None, timeout=600):
+    """Return (status, parsed JSON body or None, seconds); status is None if the server was unreachable."""
+    if isinstance(body, dict):
+        body = json.dumps(body).encode('utf-8')
+        headers = dict(headers or {}, **{'Content-Type': 'application/json'})
+    req = urllib.request.Request(url, data=body, headers=headers or {}, method=method)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            status, raw = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, raw = e.code, e.read()
+    except OSError:
+        return None, None, time.perf_counter() - started
+    elapsed = time.perf_counter() - started
+    try:
+        return status, json.loads(raw), elapsed
+    except ValueError:
+        return status, None, elapsed
+
+
+def time_to_first_token(url, body, timeout=600):
+    """POST to an NDJSON streaming route; returns (seconds to first token, total seconds) or (None, None)."""
+    req = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'),
+                                 headers={'Content-Type': 'application/json'})
+    started = time.perf_counter()
+    first = None
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            for line in response:
+                if first is None and line.strip() and json.loads(line).get('type') == 'token':
+                    first = time.perf_counter() - started
+    except (OSError, ValueError):
+        return None, None
+    return first, time.perf_counter() - started
+
+
+def upload_pdf(base_url, path):
+    """Upload a PDF as multipart/form-data; returns (status, body, seconds)."""
+    boundary = uuid.uuid4().hex
+    with open(path, 'rb') as f:
+        data = f.read()
+    body = b"".join([
+        f'--{boundary}\r\nContent-Disposition: form-data; name="pdf"; filename="{os.path.basename(path)}"\r\n'
+        f'Content-Type: application/pdf\r\n\r\n'.encode('utf-8'),
+        data,
+        f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    ])
+    return call('POST', f"{base_url}/api/upload_pdf", body,
+                headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+
+def wait_for_job(base_url, job_id, timeout=3600, interval=0.25):
+    """Poll a background job until it finishes; returns the final job payload."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status, job, _ = call('GET', f"{base_url}/api/jobs/{job_id}")
+        if status == 200 and job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(interval)
+    raise RuntimeError(f"Job {job_id} did not finish within {timeout}s")
+
+
+def latency_summary(latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {'count': 0}
+    return {
+        'count': len(latencies),
+        'mean': statistics.fmean(latencies),
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        'max': latencies[-1]
+    }
+
+
+def status_counts(statuses):
+    counts = {}
+    for status in statuses:
+        key = str(status) if status is not None else 'unreachable'
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+@contextmanager
+def api_server(mode, fake_url, workers, concurrency):
+    """Run the API against the fake Ollama in a scratch directory, so every run starts empty.
+
+    Scheduler limits are raised to the benchmark's concurrency, so the server
+    rather than its admission control is what gets measured.
+    """
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, OLLAMA_HOST=fake_url, PYTHONPATH=HERE, **scheduler_env(concurrency))
+    with tempfile.TemporaryDirectory() as workdir:
+        process = subprocess.Popen(server_command(mode, port, workers), cwd=workdir, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(base_url)
+            yield base_url
+        finally:
+            process.terminate()
+            process.wait()
+
+
+# Scenarios
+
+def bench_extraction(args):
+    from pdf_extraction import iter_pages
+
+    results = []
+    for pages in args.pages:
+        path = corpus_pdf(args.corpus, pages)
+        result = {'pages': pages}
+        # Plain text serially and in parallel, then the full layout the server stores
+        for label, workers, structured in (('serial', 1, False), ('parallel', None, False),
+                                           ('structured', None, True)):
+            started = time.perf_counter()
+            count = sum(1 for _ in iter_pages(path, workers, structured))
+            seconds = time.perf_counter() - started
+            result[label] = {'seconds': seconds, 'pages_per_second': count / seconds if seconds else None}
+        results.append(result)
+        print(f"extraction {pages:>5}p: serial {result['serial']['seconds']:.2f}s, "
+              f"parallel {result['parallel']['seconds']:.2f}s, structured {result['structured']['seconds']:.2f}s")
+    return results
+
+
+def bench_chat(args, base_url):
+    def one(i):
+        status, _, seconds = call('POST', f"{base_url}/api/chat", {
+            'text': f"Question {i}", 'sessionId': f"bench-{i}", 'model': 'llama3.2-vision:latest'
+        })
+        return status, seconds
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(one, range(args.requests)))
+    wall_time = time.perf_counter() - started
+
+    succeeded = [seconds for status, seconds in outcomes if status == 200]
+    result = {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'wall_time': wall_time,
+        'throughput': len(succeeded) / wall_time if wall_time else None,
+        'statuses': status_counts(status for status, _ in outcomes),
+        'latency': latency_summary(succeeded)
+    }
+    print(f"chat: {len(succeeded)}/{args.requests} ok, {result['throughput']:.1f} req/s, "
+          f"p50 {result['latency'].get('p50', 0):.2f}s")
+    return result
+
+
+def bench_upload(args, base_url):
+    results = []
+    for pages in args.pages:
+        # Distinct seeds, so no upload is deduplicated against another
+        paths = [corpus_pdf(args.corpus, pages, seed=seed) for seed in range(args.uploads)]
+
+        def one(path):
+            status, body, accept_seconds = upload_pdf(base_url, path)
+            if status != 202:
+                return status, accept_seconds, None
+            job = wait_for_job(base_url, body['jobId'])
+            return job['status'], accept_seconds, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.uploads) as pool:
+            outcomes = list(pool.map(one, paths))
+        wall_time = time.perf_counter() - started
+
+        done = [total for status, _, total in outcomes if status == 'done']
+        result = {
+            'pages': pages,
+            'uploads': args.uploads,
+            'wall_time': wall_time,
+            'statuses': status_counts(status for status, _, _ in outcomes),
+            'accept_latency': latency_summary([accept for _, accept, _ in outcomes]),
+            'completion_latency': latency_summary(done),
+            'pages_per_second': pages * len(done) / wall_time if wall_time else None
+        }
+        results.append(result)
+        print(f"upload {pages:>5}p x{args.uploads}: {len(done)} done in {wall_time:.1f}s, "
+              f"{result['pages_per_second']:.1f} pages/s")
+    return results
+
+
+def bench_pdf_question(args, base_url):
+    status, body, _ = upload_pdf(base_url, corpus_pdf(args.corpus, args.question_pages))
+    if status != 202:
+        raise RuntimeError(f"Upload for the pdf_question scenario failed with {status}: {body}")
+    job = wait_for_job(base_url, body['jobId'])
+    if job['status'] != 'done':
+        raise RuntimeError(f"Processing the pdf_question document failed: {job['error']}")
+    document_id = body['documentId']
+
+    # Every question is different, so none is answered from the response cache
+    def one(i):
+        status, _, seconds = call('POST', f"{base_url}/api/pdf_question", {
+            'text': f"When was invoice {i + 1} issued and for how much?", 'documentId': document_id
+        })
+        return status, seconds
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(one, range(args.questions)))
+    wall_time = time.perf_counter() - started
+
+    streamed = [time_to_first_token(f"{base_url}/api/pdf_question/stream", {
+        'text': f"Which amount is on invoice {args.questions + i + 1}?", 'documentId': document_id
+    }) for i in range(min(args.questions, 20))]
+
+    result = {
+        'pages': args.question_pages,
+        'questions': args.questions,
+        'concurrency': args.concurrency,
+        'wall_time': wall_time,
+        'statuses': status_counts(status for status, _ in outcomes),
+        'latency': latency_summary([seconds for status, seconds in outcomes if status == 200]),
+        'stream_time_to_first_token': latency_summary([first for first, _ in streamed if first is not None]),
+        'stream_total': latency_summary([total for first, total in streamed if first is not None])
+    }
+    print(f"pdf_question: p50 {result['latency'].get('p50', 0):.2f}s, "
+          f"first token p50 {result['stream_time_to_first_token'].get('p50', 0):.2f}s")
+    return result
+
+
+# Results
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, text=True).strip()
+        dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD'], cwd=HERE).returncode != 0
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{commit}-dirty" if dirty else commit
+
+
+def flatten(value, prefix=''):
+    """Yield (path, number) for every numeric result, e.g. ('upload[pages=50].wall_time', 12.3)."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            label = f"pages={item['pages']}" if isinstance(item, dict) and 'pages' in item else str(i)
+            yield from flatten(item, f"{prefix}[{label}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def compare(baseline, current):
+    """Print every result present in both runs with its relative change."""
+    old = dict(flatten(baseline['results']))
+    print(f"\nChange from {baseline.get('commit')} to {current.get('commit')}:")
+    for path, value in flatten(current['results']):
+        if path in old and old[path]:
+            print(f"  {path}: {old[path]:.4g} -> {value:.4g} ({(value - old[path]) / old[path] * 100:+.1f}%)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chatbot API against a fake Ollama server")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="comma-separated, from: " + ", ".join(SCENARIOS))
+    parser.add_argument('--mode', default='threaded', choices=['threaded', 'flask', 'async'],
+                        help="how the API is served (see load_test.py)")
+    parser.add_argument('--workers', type=int, default=8, help="Flask worker processes in 'flask' mode")
+    parser.add_argument('--pages', default='1,50,500,2000', help="PDF sizes for extraction and upload")
+    parser.add_argument('--corpus', default='bench_corpus', help="folder for the generated PDFs")
+    parser.add_argument('--requests', type=int, default=200, help="chat requests")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--uploads', type=int, default=4, help="concurrent uploads per PDF size")
+    parser.add_argument('--questions', type=int, default=100)
+    parser.add_argument('--question-pages', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.2, help="fake Ollama seconds before the first token")
+    parser.add_argument('--tps', type=float, default=100, help="fake Ollama tokens per second")
+    parser.add_argument('--reply-tokens', type=int, default=40)
+    parser.add_argument('--output', help="results file (default: benchmark-<commit>.json)")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+    args.scenarios = [name for name in args.scenarios.split(',') if name]
+    args.pages = [int(pages) for pages in args.pages.split(',') if pages]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    commit = git_commit()
+    results = {}
+
+    if 'extraction' in args.scenarios:
+        results['extraction'] = bench_extraction(args)
+
+    server_scenarios = [name for name in ('chat', 'upload', 'pdf_question') if name in args.scenarios]
+    fake = None
+    if server_scenarios:
+        fake = FakeOllamaServer(latency=args.latency, tokens_per_second=args.tps,
+                                reply_tokens=args.reply_tokens).start()
+        print(f"Fake Ollama on {fake.url} ({args.latency}s latency, {args.tps} tokens/s)")
+    try:
+        for name in server_scenarios:
+            # A fresh server per scenario, so caches and queues from one don't flatter the next
+            with api_server(args.mode, fake.url, args.workers,
+                            max(args.concurrency, args.uploads)) as base_url:
+                results[name] = globals()[f"bench_{name}"](args, base_url)
+    finally:
+        if fake is not None:
+            fake.stop()
+
+    report = {
+        'commit': commit,
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'fake_ollama_requests': dict(fake.request_counts) if fake else {},
+        'results': results
+    }
+    output = args.output or f"benchmark-{commit}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import json
+import hashlib
+import threading
+import logging
+from functools import lru_cache
+from collections import OrderedDict
+
+from retrieval import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Rough prompt cost of one attached image for the vision model
+IMAGE_TOKENS = 1600
+
+# Fixed per-message overhead for role markers and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=8192)
+def _cached_tokens(role, content, image_count):
+    return estimate_tokens(content) + image_count * IMAGE_TOKENS + MESSAGE_OVERHEAD_TOKENS
+
+
+def count_tokens(message):
+    """Estimated prompt tokens for one chat message (cached per message content)."""
+    return _cached_tokens(message.get('role', ''), message.get('content') or '', len(message.get('images') or ()))
+
+
+def message_key(message):
+    """Stable identity for a message, used to remember how far a summary reaches."""
+    return hashlib.sha1(json.dumps(message, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class ContextWindow:
+    """Keeps the prompt for a chat session within a token budget.
+
+    The newest messages are sent as-is; older turns that no longer fit are
+    dropped, or replaced by a rolling summary when a summarizer is given.
+    Summaries are produced in a background thread, so a turn never waits for
+    one; until it is ready the older turns are simply left out.
+    """
+
+    def __init__(self, token_budget=3000, summarizer=None, max_summaries=10000):
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+        self.max_summaries = max_summaries
+        self._summaries = OrderedDict()   # session_id -> {'text', 'last_key', 'tokens'}
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def build(self, session_id, messages):
+        """Return the messages to send for this turn."""
+        if not messages:
+            return []
+
+        with self._lock:
+            summary = self._summaries.get(session_id)
+        budget = self.token_budget - (summary['tokens'] if summary else 0)
+
+        # Walk back from the newest message; the latest one is always sent
+        start = len(messages) - 1
+        used = count_tokens(messages[start])
+        while start > 0:
+            cost = count_tokens(messages[start - 1])
+            if used + cost > budget:
+                break
+            used += cost
+            start -= 1
+
+        window = messages[start:]
+        if start == 0:
+            return window
+
+        dropped = messages[:start]
+        if self.summarizer is not None:
+            self._schedule_summary(session_id, dropped, summary)
+
+        if summary:
+            return [{'role': 'system', 'content': f"Summary of the earlier conversation:\n{summary['text']}"}] + window
+        return window
+
+    def _uncovered(self, dropped, summary):
+        """Dropped messages that the current summary doesn't include yet."""
+        if not summary:
+            return dropped
+        # Search from the end so repeated messages resolve to the latest occurrence
+        for i in range(len(dropped) - 1, -1, -1):
+            if message_key(dropped[i]) == summary['last_key']:
+                return dropped[i + 1:]
+        return dropped
+
+    def _schedule_summary(self, session_id, dropped, summary):
+        uncovered = self._uncovered(dropped, summary)
+        if not uncovered:
+            return
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+        threading.Thread(
+            target=self._summarize,
+            args=(session_id, uncovered, summary['text'] if summary else None),
+            daemon=True
+        ).start()
+
+    def _summarize(self, session_id, messages, previous):
+        try:
+            text = self.summarizer(previous, messages)
+            with self._lock:
+                self._summaries[session_id] = {
+                    'text': text,
+                    'last_key': message_key(messages[-1]),
+                    'tokens': estimate_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+                }
+                self._summaries.move_to_end(session_id)
+                while len(self._summaries) > self.max_summaries:
+                    self._summaries.popitem(last=False)
+            logger.info(f"Summarized {len(messages)} earlier messages for session {session_id}")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not summarize session {session_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(session_id)
+
+    def forget(self, session_id):
+        """Drop the rolling summary of a session (e.g. after a reset)."""
+        with self._lock:
+            self._summaries.pop(session_id, None)
+
+
+def ollama_summarizer(chat, model_name, max_words=200):
+    """Build a summarizer that folds new turns into the previous summary using chat()."""
+    def summarize(previous, messages):
+        transcript = "\n".join(f"{m['role'].upper()}: {m.get('content', '')}" for m in messages)
+        prompt = f"""
+        Update the running summary of a conversation between a user and an assistant.
+        Keep names, numbers, decisions and open questions. Use at most {max_words} words.
+
+        CURRENT SUMMARY:
+        {previous or '(none)'}
+
+        NEW MESSAGES:
+        {transcript}
+        """
+        response = chat(model=model_name, messages=[{'role': 'user', 'content': prompt}])
+        return response['message']['content'].strip()
+    return summarize
@@ -0,0 +1,139 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from response_cache import make_key
+
+logger = logging.getLogger(__name__)
+
+DIRECT_PROMPT = """
+I have extracted text from a PDF document. Please:
+1. Identify the document type
+2. Summarize the key points
+3. Extract any important dates, names, or numerical data
+
+Here is the extracted text:
+{text}
+"""
+
+MAP_PROMPT = """
+Summarize this section of a PDF document (pages {first_page}-{last_page}).
+Keep the key points and any important dates, names and numerical data.
+
+SECTION TEXT:
+{text}
+"""
+
+COMBINE_PROMPT = """
+Merge these summaries of consecutive sections of a PDF document into one summary.
+Keep the key points and any important dates, names and numerical data.
+
+SECTION SUMMARIES:
+{summaries}
+"""
+
+FINAL_PROMPT = """
+I have summarized a PDF document section by section. Based on these summaries, please:
+1. Identify the document type
+2. Summarize the key points
+3. Extract any important dates, names, or numerical data
+
+SECTION SUMMARIES:
+{summaries}
+"""
+
+
+def group_pages(pages, max_chars=8000):
+    """Group consecutive pages into sections of at most max_chars characters.
+
+    Returns dicts with 'first_page', 'last_page' (1-based) and 'text'. Pages
+    longer than max_chars are split across several sections.
+    """
+    sections = []
+    current = None
+    for page_num, page_text in enumerate(pages, start=1):
+        page_text = page_text.strip()
+        # Start a new section rather than splitting a page across two
+        if current and len(current['text']) + len(page_text) > max_chars:
+            sections.append(current)
+            current = None
+        while page_text:
+            if current is None:
+                current = {'first_page': page_num, 'last_page': page_num, 'text': ''}
+            room = max_chars - len(current['text'])
+            current['text'] += page_text[:room]
+            current['last_page'] = page_num
+            page_text = page_text[room:]
+            if page_text:
+                sections.append(current)
+                current = None
+            else:
+                current['text'] += "\n"
+    if current:
+        sections.append(current)
+    return sections
+
+
+class MapReduceSummarizer:
+    """Whole-document analysis: summarize sections concurrently, then merge the summaries.
+
+    complete(prompt, cache_key) sends one prompt to the model and returns its
+    reply; every step passes a key derived from its inputs, so a cached
+    completion function only re-runs the sections that changed. The thread
+    pool is shared by all documents, which bounds the requests in flight.
+    """
+
+    def __init__(self, complete, model_name, max_workers=4, section_chars=8000, fan_in=6):
+        self.complete = complete
+        self.model_name = model_name
+        self.section_chars = section_chars
+        self.fan_in = fan_in
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _run(self, template, **fields):
+        prompt = template.format(**fields)
+        return self.complete(prompt, make_key('analysis', self.model_name, prompt)).strip()
+
+    def _map(self, section):
+        return self._run(MAP_PROMPT, **section)
+
+    def _combine(self, summaries):
+        return self._run(COMBINE_PROMPT, summaries=self._join(summaries))
+
+    @staticmethod
+    def _join(summaries):
+        return "\n\n".join(f"[Section {i}]\n{summary}" for i, summary in enumerate(summaries, start=1))
+
+    def summarize(self, pages, progress=None):
+        """Return the analysis of a whole document given its page texts.
+
+        progress(stage, done, total) is called as sections complete.
+        """
+        sections = group_pages(pages, self.section_chars)
+        if not sections:
+            raise ValueError("The document has no text to analyze")
+        if len(sections) == 1:
+            with tracing.span('analysis_direct'):
+                return self._run(DIRECT_PROMPT, text=sections[0]['text'])
+        logger.info(f"Analyzing {len(pages)} pages as {len(sections)} sections")
+
+        # Pool threads join the caller's trace
+        summaries = []
+        with tracing.span('analysis_map', sections=len(sections)):
+            for summary in self._pool.map(tracing.in_context(self._map), sections):
+                summaries.append(summary)
+                if progress:
+                    progress('map', len(summaries), len(sections))
+
+        # Merge groups of summaries level by level until one prompt can hold them all
+        level = 0
+        while len(summaries) > self.fan_in:
+            level += 1
+            groups = [summaries[i:i + self.fan_in] for i in range(0, len(summaries), self.fan_in)]
+            with tracing.span('analysis_reduce', level=level, groups=len(groups)):
+                summaries = list(self._pool.map(tracing.in_context(self._combine), groups))
+            if progress:
+                progress(f'reduce {level}', len(summaries), len(groups))
+
+        with tracing.span('analysis_final'):
+            return self._run(FINAL_PROMPT, summaries=self._join(summaries))
@@ -0,0 +1,94 @@
+import time
+import threading
+import logging
+
+import metrics
+import tracing
+from pdf_extraction import count_pages, iter_pages
+from retrieval import BM25Index, chunk_pages
+
+logger = logging.getLogger(__name__)
+
+INGESTION_SECONDS = metrics.histogram('document_ingestion_seconds', 'Time to extract, store and index a whole PDF')
+
+
+class DocumentIngestion:
+    """Extracts a PDF page by page, feeding each page to the index and the store.
+
+    Pages are extracted with their layout (text blocks, tables, images), so
+    nothing downstream needs to open the PDF again.
+
+    The index is searchable from the first page on, so questions can be
+    answered about the pages processed so far while the rest are extracted.
+    Page texts go straight to the index and to disk rather than being kept
+    together in memory.
+    """
+
+    def __init__(self, document_id, pdf_path, store, metadata=None, workers=None, on_complete=None):
+        self.document_id = document_id
+        self.pdf_path = pdf_path
+        self.store = store
+        self.metadata = metadata
+        self.workers = workers
+        self.on_complete = on_complete
+        self.index = BM25Index()
+        self.total_pages = count_pages(pdf_path)
+        self.pages_done = 0
+        self.chars = 0
+        self.error = None
+        self.finished = False
+        self._changed = threading.Condition()
+
+    def start(self):
+        threading.Thread(target=tracing.in_context(self.run), daemon=True).start()
+        return self
+
+    def run(self):
+        logger.info(f"Ingesting {self.total_pages} pages of document {self.document_id[:12]}")
+        started = time.perf_counter()
+        try:
+            with tracing.span('ingestion', document=self.document_id[:12], pages=self.total_pages):
+                self._ingest()
+            INGESTION_SECONDS.observe(time.perf_counter() - started)
+        except Exception as e:
+            logger.error(f"Error ingesting document {self.document_id[:12]}: {e}")
+            self.error = str(e)
+
+        with self._changed:
+            self.finished = True
+            self._changed.notify_all()
+        if self.on_complete:
+            self.on_complete(self)
+
+    def _ingest(self):
+        with self.store.writer(self.document_id, self.metadata) as writer:
+            # One pass over the PDF: the stored page keeps its layout, the index gets its text
+            for page_num, page in iter_pages(self.pdf_path, self.workers):
+                writer.add_page(page)
+                self.index.add(chunk_pages([page['text']], first_page=page_num + 1))
+                with self._changed:
+                    self.pages_done += 1
+                    self.chars += len(page['text'])
+                    self._changed.notify_all()
+                # Log progress every 5 pages to avoid log flooding
+                if self.pages_done % 5 == 0 or self.pages_done == self.total_pages:
+                    logger.info(f"Progress: {self.pages_done / self.total_pages * 100:.1f}% "
+                                f"(Page {self.pages_done}/{self.total_pages})")
+            if not self.chars:
+                raise ValueError("No text could be extracted")
+
+    def wait(self, timeout=None):
+        """Block until every page has been processed; returns True when finished."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.finished, timeout)
+
+    def status(self):
+        with self._changed:
+            return {
+                'documentId': self.document_id,
+                'pages': self.total_pages,
+                'pagesProcessed': self.pages_done,
+                'chars': self.chars,
+                'complete': self.finished and self.error is None,
+                'error': self.error
+            }
@@ -0,0 +1,273 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import time
+import zlib
+import logging
+from collections import OrderedDict
+
+try:
+    import msgpack
+except ImportError:  # Optional; pages are stored as compressed JSON without it
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_FOLDER = 'documents'
+
+# Decoded pages kept in memory across all documents
+PAGE_CACHE_SIZE = 256
+
+
+def encode_page(page):
+    """Serialize one page record: a format byte, then the zlib-compressed msgpack or JSON."""
+    if msgpack is not None:
+        return b'm' + zlib.compress(msgpack.packb(page, use_bin_type=True))
+    return b'j' + zlib.compress(json.dumps(page, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_page(data):
+    body = zlib.decompress(data[1:])
+    if data[:1] == b'm':
+        if msgpack is None:
+            raise ValueError("Page was stored with msgpack, which is not installed")
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def store_upload(stream, folder, spool_size=32 * 1024 * 1024, chunk_size=1024 * 1024):
+    """Save an uploaded file under its content hash, hashing while it streams in.
+
+    The upload is spooled in memory (up to spool_size) so a file that is
+    already stored never touches the disk again.
+    Returns (document_id, path, is_new).
+    """
+    digest = hashlib.sha256()
+    with tempfile.SpooledTemporaryFile(max_size=spool_size, dir=folder) as spool:
+        for block in iter(lambda: stream.read(chunk_size), b''):
+            digest.update(block)
+            spool.write(block)
+
+        document_id = digest.hexdigest()
+        path = os.path.join(folder, f"{document_id}.pdf")
+        if os.path.exists(path):
+            return document_id, path, False
+
+        spool.seek(0)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(spool, f, chunk_size)
+        os.replace(tmp_path, path)
+    return document_id, path, True
+
+
+class DocumentStore:
+    """Registry of extracted PDF documents persisted on disk, keyed by content hash.
+
+    Each page is stored as one compressed record (text, blocks with bounding
+    boxes, tables, images; see pdf_extraction.read_page) in a .pages file,
+    whose byte spans are listed in the document's JSON record, so a single
+    page is read without loading the rest.
+    """
+
+    def __init__(self, folder=DOCUMENT_FOLDER, page_cache_size=PAGE_CACHE_SIZE):
+        self.folder = folder
+        self.page_cache_size = page_cache_size
+        self._cache = {}
+        self._pages = OrderedDict()   # (document_id, index) -> decoded page, least recently used first
+        self._lock = threading.Lock()
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def _path(self, document_id):
+        # Ids are hex digests, so anything else cannot refer to a stored document
+        if not document_id or not all(c in '0123456789abcdef' for c in document_id):
+            return None
+        return os.path.join(self.folder, f"{document_id}.json")
+
+    def _pages_path(self, document_id):
+        return os.path.join(self.folder, f"{document_id}.pages")
+
+    def _write(self, record):
+        # The pages live in the .pages file; the JSON only holds metadata and page spans
+        path = self._path(record['id'])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def writer(self, document_id, metadata=None):
+        """Return a DocumentWriter that stores a document one page at a time."""
+        return DocumentWriter(self, document_id, metadata)
+
+    def add(self, document_id, pages, metadata=None):
+        """Store the pages (texts or page dicts) of a document and return its record."""
+        with self.writer(document_id, metadata) as writer:
+            for page in pages:
+                writer.add_page(page)
+        return self.get(document_id)
+
+    def _finish(self, record):
+        with self._lock:
+            self._write(record)
+            self._cache.pop(record['id'], None)
+            for key in [key for key in self._pages if key[0] == record['id']]:
+                del self._pages[key]
+        metadata = record['metadata']
+        logger.info(f"Document {record['id'][:12]} stored ({metadata['pages']} pages, {metadata['chars']} chars)")
+
+    def get(self, document_id):
+        """Return the stored record for a document, or None if it is unknown."""
+        with self._lock:
+            if document_id in self._cache:
+                return self._cache[document_id]
+
+        path = self._path(document_id)
+        if not path or not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading document {document_id}: {e}")
+            return None
+
+        with self._lock:
+            self._cache[document_id] = record
+        return record
+
+    def set_analysis(self, document_id, model_name, analysis):
+        """Persist the initial analysis of a document so re-uploads can reuse it."""
+        record = self.get(document_id)
+        if record is None:
+            return
+        with self._lock:
+            record.setdefault('analysis', {})[model_name] = analysis
+            self._write(record)
+
+    def get_analysis(self, document_id, model_name):
+        record = self.get(document_id)
+        if record is None:
+            return None
+        return record.get('analysis', {}).get(model_name)
+
+    def __contains__(self, document_id):
+        return self.get(document_id) is not None
+
+    def page(self, document_id, index):
+        """Return one page (0-based) of a stored document as a dict, or None if there is no such page.
+
+        Only that page is read from disk; recently read pages are cached.
+        """
+        record = self.get(document_id)
+        if not record or not 0 <= index < len(record['page_spans']):
+            return None
+
+        key = (document_id, index)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                return page
+
+        offset, length = record['page_spans'][index]
+        with open(self._pages_path(document_id), 'rb') as f:
+            f.seek(offset)
+            page = decode_page(f.read(length))
+
+        with self._lock:
+            self._pages[key] = page
+            while len(self._pages) > self.page_cache_size:
+                self._pages.popitem(last=False)
+        return page
+
+    def iter_pages(self, document_id):
+        """Yield the pages of a stored document in order, reading the file once."""
+        record = self.get(document_id)
+        if not record:
+            return
+        with open(self._pages_path(document_id), 'rb') as f:
+            for offset, length in record['page_spans']:
+                f.seek(offset)
+                yield decode_page(f.read(length))
+
+    def pages(self, document_id):
+        """Return the list of page texts of a stored document."""
+        record = self.get(document_id)
+        if not record:
+            return None
+        return [page['text'] for page in self.iter_pages(document_id)]
+
+
+class DocumentWriter:
+    """Streams the pages of a new document to disk as they are extracted.
+
+    Only the byte spans of the pages are kept in memory; the document
+    becomes visible in the store once the writer is closed.
+    """
+
+    def __init__(self, store, document_id, metadata=None):
+        self.store = store
+        self.document_id = document_id
+        self.metadata = dict(metadata or {})
+        self.page_spans = []     # [byte offset, length] of each page record in the .pages file
+        self.chars = 0
+        self.tables = 0
+        self.images = 0
+        self._pages_path = store._pages_path(document_id)
+        self._tmp_path = f"{self._pages_path}.{threading.get_ident()}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._size = 0
+
+    def add_page(self, page):
+        """Append a page, given as a page dict from pdf_extraction.read_page or as plain text."""
+        if isinstance(page, str):
+            page = {'text': page}
+        data = encode_page(page)
+        self._file.write(data)
+        self.page_spans.append([self._size, len(data)])
+        self._size += len(data)
+        self.chars += len(page['text'])
+        self.tables += len(page.get('tables', ()))
+        self.images += len(page.get('images', ()))
+
+    def close(self):
+        """Finish the document and register it with the store."""
+        self._file.close()
+        os.replace(self._tmp_path, self._pages_path)
+        self.store._finish({
+            'id': self.document_id,
+            'page_spans': self.page_spans,
+            'metadata': dict(self.metadata, pages=len(self.page_spans), chars=self.chars,
+                             tables=self.tables, images=self.images, created=time.time())
+        })
+
+    def abort(self):
+        """Discard a partially written document."""
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
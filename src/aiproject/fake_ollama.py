@@ -0,0 +1,314 @@
+import json
+import time
+import asyncio
+import zlib
+import argparse
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ollama_client import OllamaError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODELS = ["llama3.2-vision:latest", "mistral:latest", "nomic-embed-text:latest"]
+
+
+def fake_reply_tokens(count):
+    return [f"token{i} " for i in range(count)]
+
+
+def fake_embedding(text, dim):
+    """Deterministic bag-of-words vector so similar texts get similar embeddings."""
+    vector = [0.0] * dim
+    for word in text.lower().split():
+        vector[zlib.crc32(word.encode('utf-8')) % dim] += 1.0
+    return vector
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Answers the subset of the Ollama HTTP API used by the app."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _send_chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path in ('/api/tags', '/api/ps'):
+            # Every fake model counts as installed and loaded
+            self._send_json({'models': [{'name': name} for name in self.server.models]})
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        body = self._read_json()
+        model = body.get('model', '')
+        self.server.count_request(self.path)
+
+        if self.path in ('/api/chat', '/api/generate'):
+            if model not in self.server.models:
+                self._send_json({'error': f"model '{model}' not found"}, 404)
+                return
+            # Model load probes send an empty prompt and get an immediate reply
+            if self.path == '/api/generate' and not body.get('prompt'):
+                self._send_json({'model': model, 'response': '', 'done': True})
+                return
+            self._generate(model, body, chat=self.path == '/api/chat')
+        elif self.path in ('/api/embed', '/api/embeddings'):
+            inputs = body.get('input', body.get('prompt', ''))
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            vectors = [self.server.embed(text) for text in inputs]
+            if self.path == '/api/embeddings':
+                self._send_json({'embedding': vectors[0]})
+            else:
+                self._send_json({'model': model, 'embeddings': vectors})
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def _generate(self, model, body, chat):
+        tokens = self.server.reply_tokens()
+        stream = body.get('stream', True)
+        started = time.time()
+
+        # Prompt processing time before the first token
+        time.sleep(self.server.latency)
+
+        def frame(content, done):
+            payload = {'model': model, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ'), 'done': done}
+            if chat:
+                payload['message'] = {'role': 'assistant', 'content': content}
+            else:
+                payload['response'] = content
+            if done:
+                payload['done_reason'] = 'stop'
+                payload['total_duration'] = int((time.time() - started) * 1e9)
+                payload['eval_count'] = len(tokens)
+            return payload
+
+        if not stream:
+            time.sleep(len(tokens) * self.server.token_delay)
+            self._send_json(frame("".join(tokens), True))
+            return
+
+        self._start_stream()
+        for token in tokens:
+            time.sleep(self.server.token_delay)
+            self._send_chunk(frame(token, False))
+        self._send_chunk(frame("", True))
+        self._end_stream()
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """In-process stand-in for an Ollama server with configurable speed.
+
+    latency is the delay before the first token and tokens_per_second the
+    generation rate afterwards; 0 disables either delay.
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.5, tokens_per_second=50,
+                 reply_tokens=40, models=None, embedding_dim=64):
+        super().__init__((host, port), FakeOllamaHandler)
+        self.latency = latency
+        self.token_delay = 1.0 / tokens_per_second if tokens_per_second else 0.0
+        self.reply_length = reply_tokens
+        self.models = list(models or DEFAULT_MODELS)
+        self.embedding_dim = embedding_dim
+        self.request_counts = {}
+        self._counts_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self, path):
+        with self._counts_lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+    def reply_tokens(self):
+        return fake_reply_tokens(self.reply_length)
+
+    def embed(self, text):
+        return fake_embedding(text, self.embedding_dim)
+
+    def start(self):
+        """Serve in a background thread and return self."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeOllamaClient:
+    """In-process stand-in for ollama_client.OllamaClient, without any HTTP.
+
+    Replies are the same canned tokens the fake server sends, after the same
+    optional delays; requests is a count of calls per method.
+    """
+
+    def __init__(self, models=None, latency=0.0, tokens_per_second=0, reply_tokens=40, embedding_dim=64):
+        self.host = "fake://ollama"
+        self.models = list(models or DEFAULT_MODELS)
+        self.latency = latency
+        self.token_delay = 1.0 / tokens_per_second if tokens_per_second else 0.0
+        self.reply_length = reply_tokens
+        self.embedding_dim = embedding_dim
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    def _begin(self, method, model=None):
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+        if model is not None and model not in self.models:
+            raise OllamaError(f"model '{model}' not found", 404)
+
+    @staticmethod
+    def _frame(model, chat, content, done):
+        payload = {'model': model, 'done': done}
+        if chat:
+            payload['message'] = {'role': 'assistant', 'content': content}
+        else:
+            payload['response'] = content
+        return payload
+
+    def _reply(self, model, chat, stream):
+        time.sleep(self.latency)
+        tokens = fake_reply_tokens(self.reply_length)
+
+        if not stream:
+            time.sleep(len(tokens) * self.token_delay)
+            return self._frame(model, chat, "".join(tokens), True)
+
+        def chunks():
+            for token in tokens:
+                time.sleep(self.token_delay)
+                yield self._frame(model, chat, token, False)
+            yield self._frame(model, chat, "", True)
+        return chunks()
+
+    def tags(self, timeout=None):
+        self._begin('tags')
+        return list(self.models)
+
+    def ps(self, timeout=None):
+        self._begin('ps')
+        return list(self.models)
+
+    def chat(self, model, messages, stream=False, options=None, timeout=None, **extra):
+        self._begin('chat', model)
+        return self._reply(model, True, stream)
+
+    def generate(self, model, prompt, stream=False, options=None, timeout=None, **extra):
+        self._begin('generate', model)
+        if not prompt and not stream:
+            return {'model': model, 'response': '', 'done': True}
+        return self._reply(model, False, stream)
+
+    def embed(self, model, inputs, timeout=None):
+        # Like the fake server, any embedding model name is accepted
+        self._begin('embed')
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        return [fake_embedding(text, self.embedding_dim) for text in inputs]
+
+    def load(self, model, timeout=None, **extra):
+        return self.generate(model, '', timeout=timeout, **extra)
+
+
+class AsyncFakeOllamaClient:
+    """asyncio counterpart of FakeOllamaClient, standing in for ollama_client.AsyncOllamaClient."""
+
+    def __init__(self, **kwargs):
+        self.fake = FakeOllamaClient(**kwargs)
+        self.host = self.fake.host
+
+    async def _reply(self, model, chat, stream):
+        await asyncio.sleep(self.fake.latency)
+        tokens = fake_reply_tokens(self.fake.reply_length)
+
+        if not stream:
+            await asyncio.sleep(len(tokens) * self.fake.token_delay)
+            return self.fake._frame(model, chat, "".join(tokens), True)
+
+        async def chunks():
+            for token in tokens:
+                await asyncio.sleep(self.fake.token_delay)
+                yield self.fake._frame(model, chat, token, False)
+            yield self.fake._frame(model, chat, "", True)
+        return chunks()
+
+    async def tags(self):
+        return self.fake.tags()
+
+    async def chat(self, model, messages, stream=False, options=None, **extra):
+        self.fake._begin('chat', model)
+        return await self._reply(model, True, stream)
+
+    async def generate(self, model, prompt, stream=False, options=None, **extra):
+        self.fake._begin('generate', model)
+        if not prompt and not stream:
+            return {'model': model, 'response': '', 'done': True}
+        return await self._reply(model, False, stream)
+
+    async def aclose(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server for local testing")
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--latency', type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument('--tps', type=float, default=50, help="tokens generated per second")
+    parser.add_argument('--tokens', type=int, default=40, help="tokens per reply")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = FakeOllamaServer(port=args.port, latency=args.latency, tokens_per_second=args.tps,
+                              reply_tokens=args.tokens)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
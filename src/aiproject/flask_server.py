@@ -0,0 +1,1217 @@
+from flask import Flask, Response, g, request, jsonify, send_from_directory
+import os
+import time
+import threading
+from flask_cors import CORS
+import uuid
+import tempfile
+import logging
+import json
+import metrics
+import tracing
+from collections import OrderedDict
+from contextlib import contextmanager
+from document_store import DocumentStore, hash_file, store_upload
+from document_pipeline import DocumentIngestion
+from document_analysis import MapReduceSummarizer
+from image_ingest import ImageStore, decode_data_url, message_images
+from janitor import FolderQuota, Janitor
+from job_queue import JobQueue, QueueFull
+from retrieval import build_index, format_context, fuse_rankings
+from vector_index import VectorIndex, OllamaEmbedder, vector_search_available
+from model_health import ModelHealth
+from service_health import ServiceHealth
+from model_residency import ModelResidency
+from ollama_client import create_client, normalize_host
+from backend_pool import BackendPool
+from scheduler import RequestScheduler, Overloaded
+from session_store import create_session_store
+from context_window import ContextWindow, ollama_summarizer
+from response_cache import ResponseCache, chat_key, make_key, normalize_text
+
+# Configure logging; each line carries the trace id of the request or job it belongs to
+logging.basicConfig(level=logging.INFO, 
+                    format='%(asctime)s - %(levelname)s - [%(trace_id)s] %(message)s')
+tracing.install_log_filter()
+logger = logging.getLogger(__name__)
+
+# Every request and job is traced; traces that took at least TRACE_MIN_SECONDS are written
+# to TRACE_FOLDER as JSON. Requests sent with an X-Profile header ('cprofile' or
+# 'pyinstrument') are also profiled into PROFILE_FOLDER when ALLOW_PROFILING=1.
+TRACE_FOLDER = 'traces'
+TRACE_MIN_SECONDS = 1.0
+PROFILE_FOLDER = 'profiles'
+ALLOW_PROFILING = os.environ.get('ALLOW_PROFILING') == '1'
+
+app = Flask(__name__, static_folder='../build')
+CORS(app)  # Enable CORS for all routes
+
+# Latency of every request by route, and of the stages inside chat, upload_pdf and pdf_question
+REQUEST_SECONDS = metrics.histogram('http_request_duration_seconds', 'Time to serve an HTTP request',
+                                    ['route', 'method', 'status'])
+STAGE_SECONDS = metrics.histogram('request_stage_seconds', 'Time spent in one stage of handling a request', ['stage'])
+
+@contextmanager
+def stage(name, **attributes):
+    """Time one stage of a request, as a trace span and in request_stage_seconds"""
+    with tracing.span(name, **attributes), STAGE_SECONDS.time(stage=name):
+        yield
+
+@app.before_request
+def start_request_trace():
+    g.request_started = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else request.path
+    # A caller (or proxy) may pass its own trace id to tie our trace to theirs; malformed ids are replaced
+    g.trace = tracing.begin(f"{request.method} {route}",
+                            trace_id=tracing.valid_trace_id(request.headers.get(tracing.TRACE_HEADER)))
+    profile = request.headers.get(tracing.PROFILE_HEADER)
+    if profile and ALLOW_PROFILING:
+        profiler = tracing.Profiler(profile)
+        if profiler.start():
+            g.profiler = profiler
+        else:
+            logger.info("Another request is being profiled; not profiling this one")
+
+@app.after_request
+def finish_request_trace(response):
+    """Record latency, trace and profile once the response is sent; streams count until their last byte"""
+    started = g.get('request_started')
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    method, status_code = request.method, response.status_code
+    span, profiler = g.trace, g.get('profiler')
+    span.set(status=status_code)
+    response.headers[tracing.TRACE_HEADER] = span.trace.trace_id
+    
+    def finish():
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=method, status=status_code)
+        if profiler is not None:
+            path = profiler.save(PROFILE_FOLDER, f"{span.trace.trace_id}-{span.span_id}")
+            logger.info(f"Profile of {method} {route} written to {path}")
+        # Profiled requests always keep their trace, however fast they were
+        tracing.end(span, export=profiler is not None)
+    
+    response.call_on_close(finish)
+    return response
+
+# Worker processes for PDF text extraction (None = one per CPU core)
+EXTRACTION_WORKERS = None
+
+# Ollama server address (same environment variable the ollama client library reads)
+OLLAMA_HOST = os.environ.get('OLLAMA_HOST', 'http://localhost:11434')
+if '://' not in OLLAMA_HOST:
+    OLLAMA_HOST = f"http://{OLLAMA_HOST}"
+
+# Every Ollama request goes through one pooled client: 'http' talks to OLLAMA_HOST,
+# 'fake' answers in-process with canned replies (tests and benchmarks)
+OLLAMA_CLIENT = os.environ.get('OLLAMA_CLIENT', 'http')
+OLLAMA_TIMEOUT = 300    # seconds to wait for a generation
+OLLAMA_RETRIES = 2      # retries with backoff when Ollama is unreachable or overloaded
+
+# Several Ollama boxes can be listed comma-separated; requests are balanced across them
+OLLAMA_HOSTS = [normalize_host(host) for host in os.environ.get('OLLAMA_HOSTS', OLLAMA_HOST).split(',') if host.strip()]
+
+# Keeps the models in use loaded on every host; every request asks Ollama to keep its model for MODEL_KEEP_ALIVE
+MODEL_KEEP_ALIVE = 1800           # seconds
+MODEL_ACTIVE_WINDOW = 3600        # models used within this long are pinged before their keep-alive lapses
+PRELOAD_MODELS = ["llama3.2-vision:latest", "mistral:latest"]
+
+# Generation metrics per model, from the timings and token counts in Ollama's final response
+OLLAMA_TTFT_SECONDS = metrics.histogram('ollama_time_to_first_token_seconds',
+                                        'Time from a streamed request to its first token, including any queueing', ['model'])
+OLLAMA_GENERATION_SECONDS = metrics.histogram('ollama_generation_seconds', 'Total generation time reported by Ollama', ['model'])
+OLLAMA_PROMPT_TOKENS = metrics.histogram('ollama_prompt_tokens', 'Prompt tokens evaluated per request', ['model'],
+                                         buckets=metrics.TOKEN_BUCKETS)
+OLLAMA_RESPONSE_TOKENS = metrics.histogram('ollama_response_tokens', 'Tokens generated per response', ['model'],
+                                           buckets=metrics.TOKEN_BUCKETS)
+
+def record_ollama_response(host, model_name, response):
+    """Feed a finished generation to the health monitor, the residency manager and the metrics"""
+    # Any answer from Ollama shows it is reachable again
+    ollama_health.record_success()
+    # Empty-prompt loads (health probes) are not generations
+    if response.get('done_reason') == 'load':
+        return
+    model_residency.record(host, model_name, response)
+    if not response.get('done'):
+        return
+    if 'total_duration' in response:
+        OLLAMA_GENERATION_SECONDS.observe(response['total_duration'] / 1e9, model=model_name)
+    # Ollama leaves out prompt_eval_count when the whole prompt was cached
+    if 'prompt_eval_count' in response:
+        OLLAMA_PROMPT_TOKENS.observe(response['prompt_eval_count'], model=model_name)
+    if 'eval_count' in response:
+        OLLAMA_RESPONSE_TOKENS.observe(response['eval_count'], model=model_name)
+
+# Admission control in front of Ollama: per-model queues, served fairly across sessions
+# and in batches per model so mixed traffic doesn't make Ollama swap models constantly.
+# The limits can be set from the environment to match the Ollama hosts (or a load test).
+OLLAMA_PARALLEL = int(os.environ.get('OLLAMA_PARALLEL', 2))             # generations each host runs at once (OLLAMA_NUM_PARALLEL on the server)
+SCHEDULER_MAX_QUEUE = int(os.environ.get('SCHEDULER_MAX_QUEUE', 32))    # requests waiting per model before new ones get a 429
+SCHEDULER_MAX_WAIT = float(os.environ.get('SCHEDULER_MAX_WAIT', 120))   # seconds an interactive request waits for a slot
+SCHEDULER_BATCH = int(os.environ.get('SCHEDULER_BATCH', 8))             # requests for the running model served before switching to a waiting one
+VISION_PARALLEL = int(os.environ.get('VISION_PARALLEL', 1))             # vision generations per host; it is the heaviest model
+
+def scheduled_chat(model, messages, **kwargs):
+    """ollama_client.chat for background work, waiting its turn in the scheduler"""
+    with request_scheduler.slot(model, background=True):
+        return ollama_client.chat(model=model, messages=messages, keep_alive=MODEL_KEEP_ALIVE, **kwargs)
+
+# Configure folders
+UPLOAD_FOLDER = 'uploads'
+PDF_FOLDER = 'pdfs'
+
+# Models the application uses
+REQUIRED_MODELS = ["llama3.2-vision:latest", "mistral:latest"]
+
+# How often the background prober re-checks models that haven't served a request
+MODEL_PROBE_INTERVAL = 60
+
+# Circuit breaker in front of Ollama: request handlers never wait on a health check. While
+# Ollama is unreachable requests fail fast with a 503, and the monitor retries after
+# OLLAMA_RESET_TIMEOUT seconds, backing off up to OLLAMA_MAX_RESET_TIMEOUT.
+OLLAMA_CHECK_INTERVAL = 30      # seconds between checks while Ollama is up
+OLLAMA_FAILURE_THRESHOLD = 2    # connection failures in a row that open the breaker
+OLLAMA_RESET_TIMEOUT = 5
+OLLAMA_MAX_RESET_TIMEOUT = 60
+
+def probe_ollama_service():
+    """Health probe: list the models on every host and record which ones are installed.
+    
+    Raises OllamaError if no host is reachable.
+    """
+    model_names = ollama_client.tags()
+    for model_name in model_health.model_names():
+        base_model_name = model_name.split(":")[0]
+        if model_name in model_names or any(base_model_name in m for m in model_names):
+            model_health.mark_available(model_name)
+        else:
+            model_health.mark_failed(model_name, f"Model {model_name} not found", not_found=True)
+            logger.warning(f"⚠️ Model {model_name} is not available. Please run: ollama pull {model_name}")
+
+def check_ollama_service():
+    """Check right away whether Ollama is running; for explicit refreshes, not request handlers"""
+    return ollama_health.check_now()
+
+def test_model(model_name):
+    """Test if a model can be used by sending a simple request"""
+    try:
+        logger.info(f"Testing model {model_name}...")
+        response = ollama_client.chat(
+            model=model_name,
+            messages=[{'role': 'user', 'content': 'Hello, test message'}]
+        )   
+        model_health.mark_working(model_name)
+        logger.info(f"✅ Model {model_name} is working")
+        return True
+    except Exception as e:
+        model_health.mark_failed(model_name, str(e))
+        logger.error(f"❌ Error testing model {model_name}: {e}")
+        return False
+
+def initialize_ollama():
+    """Initialize connection to Ollama and start the background health checks"""
+    # First check if service is available
+    if not check_ollama_service():
+        logger.warning("⚠️ Ollama service is not available. Application will start but AI features won't work.")
+        logger.warning("Please install Ollama from https://ollama.com/download and start the service")
+    
+    # The monitor keeps checking the service; the prober loads each available model
+    # and keeps re-checking idle ones while the service is up
+    ollama_health.start()
+    model_health.start(ollama_health.allow)
+    
+    # Preload the configured models on every host and keep the ones in use loaded
+    model_residency.start()
+
+# Chat history storage: 'memory' (default) or 'sqlite' so sessions survive restarts
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+SESSION_TTL = 24 * 3600                 # seconds a session survives without activity
+SESSION_MAX_BYTES = 64 * 1024 * 1024    # total budget across all sessions
+SESSION_MAX_MESSAGES = 200              # oldest messages are dropped beyond this
+
+# Prompt token budget per chat turn; older turns are folded into a background summary
+CHAT_CONTEXT_TOKENS = 3000
+CHAT_SUMMARY_MODEL = "mistral:latest"
+
+def chat_messages(session_id):
+    """Messages to send for the session's next turn, within the context token budget"""
+    with stage('context_build'):
+        return context_window.build(session_id, chat_histories.get(session_id))
+
+def cached_chat(model_name, messages, cache_key=None, affinity=None, background=False):
+    """ollama_client.chat behind the response cache and the scheduler; returns the assistant message
+    
+    affinity (a session or document id) keeps related requests on the same Ollama host
+    and is the unit of fairness in the scheduler queue. Interactive requests raise
+    Overloaded after waiting SCHEDULER_MAX_WAIT seconds; background ones wait as long as it takes.
+    """
+    cache_key = cache_key or chat_key(model_name, messages)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Cache hit for request to {model_name}")
+        return {'role': 'assistant', 'content': cached}
+    
+    with tracing.span('generation', model=model_name):
+        with request_scheduler.slot(model_name, affinity, background=background):
+            response = ollama_client.chat(model=model_name, messages=messages, affinity=affinity,
+                                          keep_alive=MODEL_KEEP_ALIVE)
+    message = response['message']
+    if message['content']:
+        response_cache.put(cache_key, message['content'])
+    return message
+
+def pdf_cache_key(data, model_name):
+    """Cache key for a PDF question: the document and the question, not the full prompt"""
+    document_id = data.get('documentId')
+    # Answers about a partially extracted document fall back to the prompt-based key
+    if not document_id or document_id in ingestions:
+        return None
+    return make_key('pdf_question', model_name, document_id, normalize_text(data.get('text', '')))
+
+# BM25 chunk indexes for recently used documents, built at upload time or on first question;
+# the least recently used ones are dropped and rebuilt from the store when asked about again
+DOCUMENT_INDEX_CACHE_SIZE = 64
+document_indexes = OrderedDict()
+document_indexes_lock = threading.Lock()
+
+def cache_document_index(document_id, index):
+    with document_indexes_lock:
+        document_indexes[document_id] = index
+        document_indexes.move_to_end(document_id)
+        while len(document_indexes) > DOCUMENT_INDEX_CACHE_SIZE:
+            document_indexes.popitem(last=False)
+
+# Token budget for the PDF excerpts sent with each question
+PDF_CONTEXT_TOKENS = 2000
+
+def embed_document(document_id, index):
+    """Add a document's chunks to the vector index without failing the caller"""
+    try:
+        vector_index.add(document_id, index.chunks)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not embed document {document_id[:12]}: {e}")
+
+# Whole-document analysis: sections are summarized in parallel, then merged
+ANALYSIS_MODEL = "mistral:latest"
+ANALYSIS_WORKERS = 4          # analysis requests in flight to Ollama at once
+ANALYSIS_SECTION_CHARS = 8000 # document text summarized per request
+
+# Documents still being extracted, keyed by content hash
+ingestions = {}
+ingestions_lock = threading.Lock()
+
+# Background jobs for uploads; queued jobs are kept in SQLite and survive restarts
+JOB_DB = 'jobs.db'
+JOB_WORKERS = 2          # uploads processed at the same time
+JOB_MAX_PENDING = 100    # uploads rejected beyond this many waiting
+
+def start_ingestion(document_id, pdf_path, original_filename):
+    """Start extracting a new PDF in the background (once per document) and return its ingestion"""
+    with ingestions_lock:
+        ingestion = ingestions.get(document_id)
+        if ingestion is None:
+            ingestion = DocumentIngestion(
+                document_id, pdf_path, document_store, {'filename': original_filename},
+                workers=EXTRACTION_WORKERS, on_complete=finish_ingestion
+            )
+            ingestions[document_id] = ingestion.start()
+    return ingestion
+
+def finish_ingestion(ingestion):
+    """Hand a fully extracted document over to the regular indexes"""
+    document_id = ingestion.document_id
+    if ingestion.error is None:
+        cache_document_index(document_id, ingestion.index)
+        if vector_index is not None:
+            embed_document(document_id, ingestion.index)
+    with ingestions_lock:
+        ingestions.pop(document_id, None)
+
+def get_document_index(document_id):
+    """Return the chunk index for a stored document, building it if needed"""
+    with document_indexes_lock:
+        index = document_indexes.get(document_id)
+        if index is not None:
+            document_indexes.move_to_end(document_id)
+            return index
+    # Documents still being extracted can already be searched
+    ingestion = ingestions.get(document_id)
+    if ingestion is not None:
+        return ingestion.index
+    pages = document_store.pages(document_id)
+    if pages is None:
+        return None
+    index = build_index(pages)
+    cache_document_index(document_id, index)
+    return index
+
+@app.route('/')
+def serve():
+    return send_from_directory(app.static_folder, 'index.html')
+
+@app.route('/api/status', methods=['GET'])
+def status():
+    """Return the current status of Ollama and models, as last seen by the health monitor"""
+    return jsonify(get_status_payload())
+
+def get_status_payload():
+    """Build the /api/status response body"""
+    models, model_details = model_health.snapshot()
+    health = ollama_health.stats()
+    return {
+        'ollama_service': health['available'],
+        'ollama_health': health,
+        'models': models,
+        'model_details': model_details,
+        'last_check': health['last_check'],
+        'sessions': chat_histories.stats(),
+        'cache': response_cache.stats(),
+        'jobs': job_queue.stats(),
+        'ollama_hosts': ollama_client.stats(),
+        'scheduler': request_scheduler.stats(),
+        'model_residency': model_residency.stats(),
+        'images': image_store.stats(),
+        'janitor': janitor.stats()
+    }
+
+def error_response(error):
+    """Turn a (payload, status) error pair into a response; 429s and 503s carry a Retry-After header"""
+    payload, status_code = error
+    headers = {'Retry-After': str(payload['retryAfter'])} if 'retryAfter' in payload else {}
+    return jsonify(payload), status_code, headers
+
+def overloaded_error(error, **extra):
+    """(payload, status) pair for a request turned away by the scheduler"""
+    return dict(extra,
+        response=f"⚠️ {error} right now. Please try again in {error.retry_after} seconds.",
+        retryAfter=error.retry_after
+    ), 429
+
+def unavailable_error(field='response', **extra):
+    """(payload, status) pair for a request failed fast while Ollama is unreachable"""
+    return dict(extra, **{
+        field: "⚠️ Ollama service is not available. Please start Ollama and try again.",
+        'retryAfter': max(1, ollama_health.retry_after())
+    }), 503
+
+def collect_component_metrics():
+    """Metrics read from the stats the queues, caches and session store already keep"""
+    scheduler = request_scheduler.stats()['models']
+    cache = response_cache.stats()
+    residency = model_residency.stats()
+    health = ollama_health.stats()
+    return [
+        ('ollama_up', 'gauge', 'Whether the Ollama circuit breaker lets requests through',
+         [({}, 1 if health['available'] else 0)]),
+        ('scheduler_queue_depth', 'gauge', 'Requests waiting for a model slot',
+         [({'model': model}, stats['queued']) for model, stats in scheduler.items()]),
+        ('scheduler_running', 'gauge', 'Requests holding a model slot',
+         [({'model': model}, stats['running']) for model, stats in scheduler.items()]),
+        ('scheduler_rejected_total', 'counter', 'Requests turned away with a 429',
+         [({'model': model}, stats['rejected'] + stats['timeouts']) for model, stats in scheduler.items()]),
+        ('scheduler_model_switches_total', 'counter', 'Times the scheduler moved on to a different model',
+         [({}, request_scheduler.swaps)]),
+        ('job_queue_jobs', 'gauge', 'Background jobs by status',
+         [({'status': status}, count) for status, count in job_queue.stats()['jobs'].items()]),
+        ('response_cache_lookups_total', 'counter', 'Response cache lookups by result',
+         [({'result': 'memory_hit'}, cache['memory_hits']), ({'result': 'disk_hit'}, cache['disk_hits']),
+          ({'result': 'miss'}, cache['misses'])]),
+        ('response_cache_hit_ratio', 'gauge', 'Share of response cache lookups that were hits',
+         [({}, cache['hit_rate'])]),
+        ('model_cold_starts_total', 'counter', 'Requests that had to wait for Ollama to load the model',
+         [({'model': model}, stats['cold_starts']) for model, stats in residency.items()]),
+        ('chat_sessions', 'gauge', 'Chat sessions held in the session store',
+         [({}, chat_histories.stats().get('sessions', 0))]),
+    ]
+
+metrics.add_collector(collect_component_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def read_chat_request():
+    """Return (data, image_stream) for a JSON or multipart/form-data chat request
+    
+    Multipart requests carry the image as a binary 'image' part, which avoids
+    the base64 inflation of a data URL in a JSON body.
+    """
+    if request.mimetype == 'multipart/form-data':
+        image = request.files.get('image')
+        return request.form.to_dict(), (image.stream if image else None)
+    return request.json, None
+
+def prepare_chat_request(data, image_stream=None):
+    """Validate a chat request and add the user's message to the session history.
+    
+    The image comes either as image_stream (multipart uploads) or as a base64
+    data URL in data['image'].
+    Returns (session_id, model_name, error); error is a (payload, status) pair or None.
+    """
+    session_id = data.get('sessionId', str(uuid.uuid4()))
+    message_text = data.get('text', '')
+    image_data = data.get('image')
+    model_name = data.get('model', 'llama3.2-vision:latest')
+    
+    # Fail fast while Ollama is known to be down
+    if not ollama_health.allow():
+        return session_id, model_name, unavailable_error(sessionId=session_id)
+    
+    # Check if the requested model is available
+    if not model_health.is_ready(model_name):
+        return session_id, model_name, ({
+            'sessionId': session_id,
+            'response': f"⚠️ Model {model_name} is not available. Please run: ollama pull {model_name}"
+        }, 400)
+    
+    # Turn the request away up front if the model's queue is already full
+    try:
+        request_scheduler.admit(model_name)
+    except Overloaded as e:
+        return session_id, model_name, overloaded_error(e, sessionId=session_id)
+    
+    # Prepare the message
+    user_message = {
+        'role': 'user',
+        'content': message_text
+    }
+    
+    # If image is included, save it (downscaled for the vision model) and add to message
+    if image_stream or image_data:
+        try:
+            if image_stream is None:
+                image_stream = decode_data_url(image_data)
+            
+            # Identical images share one file, named by their content hash
+            with stage('image_ingest'):
+                image_path = image_store.add(image_stream)
+            
+            # Add image to message
+            user_message['images'] = [image_path]
+        except Exception as e:
+            logger.error(f"Error processing image: {e}")
+            return session_id, model_name, ({
+                'sessionId': session_id,
+                'response': f"Error processing image: {str(e)}"
+            }, 400)
+    
+    # Add user message to history; the session now holds a reference to its image
+    image_store.acquire(message_images([user_message]))
+    chat_histories.append(session_id, user_message)
+    return session_id, model_name, None
+
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    session_id, model_name, error = prepare_chat_request(*read_chat_request())
+    if error:
+        return error_response(error)
+    
+    try:
+        # Get model response
+        logger.info(f"Sending request to model {model_name}")
+        message = cached_chat(
+            model_name,
+            chat_messages(session_id),
+            affinity=session_id
+        )
+        model_health.mark_working(model_name)
+        
+        # Add assistant's response to history
+        chat_histories.append(session_id, message)
+        
+        return jsonify({
+            'sessionId': session_id,
+            'response': message['content']
+        })
+    except Overloaded as e:
+        return error_response(overloaded_error(e, sessionId=session_id))
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Error from Ollama: {error_msg}")
+        message, status_code = describe_ollama_error(model_name, error_msg)
+        return jsonify({
+            'sessionId': session_id,
+            'response': message
+        }), status_code
+
+@app.route('/api/upload_pdf', methods=['POST'])
+def upload_pdf():
+    # Fail fast while Ollama is known to be down
+    if not ollama_health.allow():
+        return error_response(unavailable_error('error'))
+    
+    # Check if PDF file was provided
+    if 'pdf' not in request.files:
+        return jsonify({'error': 'No PDF file provided'}), 400
+        
+    pdf_file = request.files['pdf']
+    if pdf_file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    # Check if the file is actually a PDF
+    if not pdf_file.filename.lower().endswith('.pdf'):
+        return jsonify({'error': 'File does not appear to be a PDF'}), 400
+        
+    # The analysis model will be needed as soon as the text is extracted; load it meanwhile
+    model_residency.warm(ANALYSIS_MODEL, 'PDF upload')
+    
+    try:
+        # Save the uploaded PDF under its content hash; duplicates are not written again
+        with stage('pdf_store'):
+            document_id, pdf_path, is_new = store_upload(pdf_file.stream, PDF_FOLDER)
+        if is_new:
+            logger.info(f"PDF saved to {pdf_path}")
+        else:
+            logger.info(f"PDF {pdf_file.filename} already stored as {pdf_path}")
+        
+        # Extraction and analysis run as a background job; the client polls /api/jobs/<id>
+        payload, status_code = submit_pdf_job(pdf_path, pdf_file.filename, document_id)
+        return jsonify(payload), status_code
+    except Exception as e:
+        logger.error(f"Error processing PDF: {e}")
+        return jsonify({'error': f"Error processing PDF: {str(e)}"}), 500
+
+def submit_pdf_job(pdf_path, original_filename, document_id):
+    """Queue extraction and analysis of a saved PDF; returns a (payload, status) pair"""
+    try:
+        job_id = job_queue.submit('pdf_upload', {
+            'pdf_path': pdf_path,
+            'filename': original_filename,
+            'document_id': document_id,
+            'trace_id': tracing.current_trace_id()
+        })
+    except QueueFull:
+        return {'error': "⚠️ Too many PDFs are being processed. Please try again in a minute."}, 503
+    return {'jobId': job_id, 'documentId': document_id, 'status': 'queued'}, 202
+
+def run_pdf_job(payload, report):
+    """Job handler for uploaded PDFs; continues the trace of the upload request"""
+    with tracing.trace('pdf_upload job', trace_id=payload.get('trace_id'), document=payload['document_id'][:12]):
+        result, status_code = process_uploaded_pdf(payload['pdf_path'], payload['filename'],
+                                                   payload['document_id'], report=report)
+    if status_code != 200:
+        raise ValueError(result['error'])
+    return result
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report the progress and, once finished, the result of a background job"""
+    payload = get_job_payload(job_id)
+    if payload is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(payload)
+
+def get_job_payload(job_id):
+    """Public view of a job, with live page progress for PDF uploads"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return None
+    document_id = job['payload'].get('document_id')
+    return {
+        'jobId': job['id'],
+        'status': job['status'],
+        'queuePosition': job['queuePosition'],
+        'progress': job['progress'],
+        'document': get_document_status(document_id) if document_id else None,
+        'result': job['result'],
+        'error': job['error']
+    }
+
+def process_uploaded_pdf(pdf_path, original_filename, document_id=None, report=None):
+    """Extract, index and analyze a saved PDF; returns a (payload, status) pair
+    
+    report(progress), if given, is called as the work moves between stages.
+    """
+    report = report or (lambda progress: None)
+    
+    # Reuse the stored extraction if this exact PDF was seen before
+    document_id = document_id or hash_file(pdf_path)
+    document = document_store.get(document_id)
+    
+    if document is None:
+        # Pages are indexed as they are extracted, so questions can start before this finishes
+        report({'stage': 'extracting'})
+        with stage('pdf_extraction'):
+            ingestion = start_ingestion(document_id, pdf_path, original_filename)
+            ingestion.wait()
+        if ingestion.error:
+            return {'error': 'Could not extract text from PDF. The file may be empty or corrupted.'}, 400
+    else:
+        # Index the document now so the first question doesn't pay for it
+        index = get_document_index(document_id)
+        if (vector_index is not None and document_id not in vector_index
+                and not vector_index.is_embedding(document_id)):
+            threading.Thread(target=embed_document, args=(document_id, index), daemon=True).start()
+    document = document_store.get(document_id)
+    
+    # Check Mistral model availability for analysis
+    model_name = "mistral:latest"
+    report({'stage': 'analyzing'})
+    
+    # Reuse the analysis from an earlier upload of the same document
+    analysis = document_store.get_analysis(document_id, model_name)
+    if analysis is not None:
+        logger.info(f"Reusing stored analysis for document {document_id[:12]}")
+    # Skip the analysis if Mistral is known to be missing or failing
+    elif not model_health.is_ready(model_name):
+        analysis = f"⚠️ Cannot perform analysis: Model {model_name} is not available or not working correctly. Error: {model_health.error(model_name)}. Please run: ollama pull {model_name}"
+    else:
+        # Analyze the whole document, reporting how many sections are done
+        with stage('pdf_analysis'):
+            analysis = get_initial_analysis(
+                document_store.pages(document_id),
+                progress=lambda stage, done, total: report({'stage': 'analyzing', 'step': stage, 'done': done, 'total': total})
+            )
+        if not analysis.startswith("⚠️"):
+            document_store.set_analysis(document_id, model_name, analysis)
+    
+    return {
+        'documentId': document_id,
+        'pages': document['metadata']['pages'],
+        'chars': document['metadata']['chars'],
+        'analysis': analysis,
+        'filename': os.path.basename(pdf_path),
+        'modelStatus': model_health.details(model_name)
+    }, 200
+
+@app.route('/api/documents/<document_id>/status', methods=['GET'])
+def document_status(document_id):
+    """Report how far extraction of an uploaded document has progressed"""
+    payload = get_document_status(document_id)
+    if payload is None:
+        return jsonify({'error': 'Document not found'}), 404
+    return jsonify(payload)
+
+@app.route('/api/documents/<document_id>/pages/<int:page_number>', methods=['GET'])
+def document_page(document_id, page_number):
+    """Return one page of a stored document with its layout: text blocks, tables and images"""
+    payload = get_document_page(document_id, page_number)
+    if payload is None:
+        return jsonify({'error': 'Page not found'}), 404
+    return jsonify(payload)
+
+def get_document_page(document_id, page_number):
+    """A stored page (1-based) read from the extraction cache, or None if there is no such page"""
+    page = document_store.page(document_id, page_number - 1)
+    if page is None:
+        return None
+    return dict(page, documentId=document_id, page=page_number)
+
+def get_document_status(document_id):
+    """Extraction progress of a document, or None if it is unknown"""
+    ingestion = ingestions.get(document_id)
+    if ingestion is not None:
+        return ingestion.status()
+    document = document_store.get(document_id)
+    if document is None:
+        return None
+    return {
+        'documentId': document_id,
+        'pages': document['metadata']['pages'],
+        'pagesProcessed': document['metadata']['pages'],
+        'chars': document['metadata']['chars'],
+        'tables': document['metadata'].get('tables'),
+        'images': document['metadata'].get('images'),
+        'complete': True,
+        'error': None
+    }
+
+def get_initial_analysis(pages, progress=None):
+    """Get the initial analysis of the whole PDF from Mistral.
+    
+    Sections of the document are summarized in parallel and the summaries
+    merged, so long documents are covered end to end.
+    """
+    logger.info("Getting initial analysis...")
+    
+    model_name = ANALYSIS_MODEL
+    
+    try:
+        logger.info(f"Sending analysis requests to {model_name}")
+        
+        # Each section is cached, so re-analysis only sends sections that changed
+        analysis = document_analyzer.summarize(pages, progress=progress)
+        
+        # Mark model as working
+        model_health.mark_working(model_name)
+        
+        return analysis
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Error with analysis: {error_msg}")
+        
+        # Update model status if it's a model-related error
+        if "no such model" in error_msg.lower() or "model not found" in error_msg.lower():
+            model_health.mark_failed(model_name, error_msg, not_found=True)
+            return f"⚠️ Cannot analyze document: Model {model_name} is not available. Please run: ollama pull {model_name}"
+        elif "context" in error_msg.lower() and "length" in error_msg.lower():
+            # Handle context length errors
+            model_health.set_error(model_name, error_msg)
+            return f"⚠️ The PDF document is too large for the model's context window. Try asking specific questions about sections instead."
+        else:
+            # Other errors
+            model_health.mark_failed(model_name, error_msg)
+            return f"⚠️ Error analyzing the document: {error_msg}. You can still ask questions about it."
+
+def prepare_pdf_question(data):
+    """Validate a PDF question and build its prompt from the most relevant excerpts.
+    
+    Returns (model_name, prompt, error); error is a (payload, status) pair or None.
+    """
+    question = data.get('text', '')
+    document_id = data.get('documentId')
+    model_name = data.get('model', 'mistral:latest')
+    
+    # Fail fast while Ollama is known to be down
+    if not ollama_health.allow():
+        return model_name, None, unavailable_error()
+    
+    # Fail fast if the model is known to be missing or failing
+    if not model_health.is_ready(model_name):
+        return model_name, None, ({
+            'response': f"⚠️ Model {model_name} is not working: {model_health.error(model_name)}. Please run: ollama pull {model_name}"
+        }, 400)
+    
+    try:
+        request_scheduler.admit(model_name)
+    except Overloaded as e:
+        return model_name, None, overloaded_error(e)
+    
+    # Look up the document on the server; older clients may still send the full text
+    if document_id:
+        with stage('document_index'):
+            index = get_document_index(document_id)
+        if index is None:
+            return model_name, None, ({'response': 'Document not found. Please upload the PDF again.'}, 404)
+    else:
+        pdf_text = data.get('pdfText', '')
+        index = build_index([pdf_text]) if pdf_text else None
+    
+    if index is None or not index.chunks:
+        return model_name, None, ({'response': 'No PDF text available to answer questions.'}, 200)
+    
+    # Only send the excerpts most relevant to the question
+    with stage('retrieval'):
+        hits = None
+        if document_id and vector_index is not None and document_id in vector_index:
+            try:
+                semantic = vector_index.search(question, top_k=8, document_id=document_id)
+                lexical = index.search(question, top_k=8)
+                hits = fuse_rankings([i for _, i in lexical], [hit[2] for hit in semantic])
+            except Exception as e:
+                logger.warning(f"⚠️ Vector search failed, using keyword search only: {e}")
+        excerpts = format_context(index.select(question, token_budget=PDF_CONTEXT_TOKENS, hits=hits))
+    
+    # Questions asked while the document is still being extracted only see the pages read so far
+    coverage = ""
+    ingestion = ingestions.get(document_id) if document_id else None
+    progress = ingestion.status() if ingestion is not None else None
+    # Fully extracted documents stay in ingestions while they are embedded
+    if progress is not None and not progress['complete']:
+        coverage = f"Only pages 1-{progress['pagesProcessed']} of {progress['pages']} have been processed so far."
+    
+    # Prepare the prompt for the question
+    prompt = f"""
+    Based on the following excerpts from a PDF document, please answer this question:
+    
+    QUESTION: {question}
+    
+    PDF EXCERPTS:
+    {excerpts}
+    
+    Please provide a clear and direct answer based only on the information in the document.
+    If the information is not in the document, please state that clearly. {coverage}
+    """
+    
+    return model_name, prompt, None
+
+@app.route('/api/pdf_question', methods=['POST'])
+def pdf_question():
+    data = request.json
+    model_name, prompt, error = prepare_pdf_question(data)
+    if error:
+        return error_response(error)
+    
+    try:
+        # Get model response
+        logger.info(f"Sending PDF question to model {model_name}")
+        message = cached_chat(
+            model_name,
+            [{'role': 'user', 'content': prompt}],
+            cache_key=pdf_cache_key(data, model_name),
+            affinity=data.get('documentId')
+        )
+        
+        # Mark model as working
+        model_health.mark_working(model_name)
+        
+        return jsonify({
+            'response': message['content']
+        })
+    except Overloaded as e:
+        return error_response(overloaded_error(e))
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Error from Ollama: {error_msg}")
+        message, status_code = describe_ollama_error(model_name, error_msg)
+        return jsonify({
+            'response': message
+        }), status_code
+
+def describe_ollama_error(model_name, error_msg):
+    """Record an Ollama failure in the model status; returns a user-facing (message, status) pair"""
+    lowered = error_msg.lower()
+    if "failed to connect" in lowered:
+        ollama_health.record_failure(error_msg)
+        return "⚠️ Lost connection to Ollama service. Please check if Ollama is still running.", 503
+    if not model_health.tracks(model_name):
+        return f"⚠️ Error: {error_msg}", 500
+    if "no such model" in lowered or "model not found" in lowered:
+        model_health.mark_failed(model_name, error_msg, not_found=True)
+        return f"⚠️ Model {model_name} not found. Please run: ollama pull {model_name}", 400
+    if "context" in lowered and "length" in lowered:
+        model_health.set_error(model_name, error_msg)
+        return "⚠️ The request is too large for the model's context window. Try asking about a specific section instead.", 400
+    model_health.mark_failed(model_name, error_msg)
+    return f"⚠️ Error: {error_msg}", 500
+
+def stream_ollama_chat(model_name, messages, on_complete=None, cache_key=None, affinity=None, **extra):
+    """Forward tokens from a streamed Ollama chat as NDJSON events.
+    
+    Emits {"type": "token"} events as the model produces them, then a single
+    {"type": "done"} event with the full response and timings (or {"type": "error"}).
+    on_complete receives the assembled assistant message once generation finishes.
+    A cached response is replayed as one token event.
+    """
+    start_time = time.time()
+    time_to_first_token = None
+    parts = []
+    cache_key = cache_key or chat_key(model_name, messages)
+    
+    yield json.dumps(dict(extra, type='start')) + "\n"
+    
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Cache hit for streamed request to {model_name}")
+        if on_complete:
+            on_complete({'role': 'assistant', 'content': cached})
+        yield json.dumps({'type': 'token', 'content': cached}) + "\n"
+        yield json.dumps(dict(extra,
+            type='done',
+            response=cached,
+            cached=True,
+            timeToFirstToken=time.time() - start_time,
+            totalTime=time.time() - start_time
+        )) + "\n"
+        return
+    
+    try:
+        logger.info(f"Streaming request to model {model_name}")
+        # The slot is held until the last token, or until the client goes away
+        with tracing.span('generation', model=model_name, stream=True):
+            with request_scheduler.slot(model_name, affinity):
+                for chunk in ollama_client.chat(model=model_name, messages=messages, stream=True, affinity=affinity,
+                                                keep_alive=MODEL_KEEP_ALIVE):
+                    content = chunk['message']['content']
+                    if not content:
+                        continue
+                    if time_to_first_token is None:
+                        time_to_first_token = time.time() - start_time
+                        OLLAMA_TTFT_SECONDS.observe(time_to_first_token, model=model_name)
+                        logger.info(f"First token from {model_name} after {time_to_first_token:.2f}s")
+                    parts.append(content)
+                    yield json.dumps({'type': 'token', 'content': content}) + "\n"
+        
+        message = {'role': 'assistant', 'content': "".join(parts)}
+        if on_complete:
+            on_complete(message)
+        if message['content']:
+            response_cache.put(cache_key, message['content'])
+        
+        if model_health.tracks(model_name):
+            model_health.mark_working(model_name)
+        
+        total_time = time.time() - start_time
+        logger.info(f"Streamed response from {model_name} complete in {total_time:.2f}s")
+        yield json.dumps(dict(extra,
+            type='done',
+            response=message['content'],
+            timeToFirstToken=time_to_first_token,
+            totalTime=total_time
+        )) + "\n"
+    except Overloaded as e:
+        payload, _ = overloaded_error(e)
+        yield json.dumps(dict(extra, type='error', **payload)) + "\n"
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Error from Ollama: {error_msg}")
+        yield json.dumps(dict(extra, type='error', response=describe_ollama_error(model_name, error_msg)[0])) + "\n"
+
+def ndjson_response(events):
+    """Wrap an NDJSON event generator in an unbuffered streaming response"""
+    return Response(events, mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming variant of /api/chat"""
+    session_id, model_name, error = prepare_chat_request(*read_chat_request())
+    if error:
+        return error_response(error)
+    
+    return ndjson_response(stream_ollama_chat(
+        model_name, chat_messages(session_id),
+        on_complete=lambda message: chat_histories.append(session_id, message),
+        affinity=session_id,
+        sessionId=session_id
+    ))
+
+@app.route('/api/pdf_question/stream', methods=['POST'])
+def pdf_question_stream():
+    """Streaming variant of /api/pdf_question"""
+    data = request.json
+    model_name, prompt, error = prepare_pdf_question(data)
+    if error:
+        return error_response(error)
+    
+    return ndjson_response(stream_ollama_chat(
+        model_name, [{'role': 'user', 'content': prompt}], cache_key=pdf_cache_key(data, model_name),
+        affinity=data.get('documentId')
+    ))
+
+# Semantic search across every indexed document
+@app.route('/api/search', methods=['POST'])
+def search_documents():
+    data = request.json
+    query = data.get('text', '')
+    try:
+        top_k = int(data.get('topK', 8))
+    except (TypeError, ValueError):
+        top_k = 0
+    
+    if vector_index is None:
+        return jsonify({'error': 'Vector search is not available (NumPy is not installed)'}), 501
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    if top_k < 1:
+        return jsonify({'error': 'topK must be a positive integer'}), 400
+    
+    try:
+        results = []
+        for score, document_id, chunk_index, page in vector_index.search(query, top_k=top_k):
+            index = get_document_index(document_id)
+            document = document_store.get(document_id)
+            results.append({
+                'documentId': document_id,
+                'filename': document['metadata'].get('filename') if document else None,
+                'page': page,
+                'score': score,
+                'text': index.chunks[chunk_index]['text'] if index else ''
+            })
+        return jsonify({'results': results})
+    except Exception as e:
+        logger.error(f"Error searching documents: {e}")
+        return jsonify({'error': f"Error searching documents: {str(e)}"}), 500
+
+# Reset chat history
+@app.route('/api/reset', methods=['POST'])
+def reset_chat():
+    data = request.json
+    session_id = data.get('sessionId')
+    
+    if session_id and chat_histories.reset(session_id):
+        context_window.forget(session_id)
+        logger.info(f"Chat history reset for session {session_id}")
+        return jsonify({'status': 'Chat history reset successfully'})
+    
+    return jsonify({'status': 'Session not found'}), 404
+
+# Route to manually refresh Ollama status and retry model connections
+@app.route('/api/refresh', methods=['GET'])
+def refresh_ollama():
+    """Manually refresh Ollama status and test models"""
+    service_available = check_ollama_service()
+    
+    if service_available:
+        # Test models in a separate thread to avoid blocking
+        threading.Thread(target=lambda: [test_model(model) for model in model_health.model_names()]).start()
+        
+        models, model_details = model_health.snapshot()
+        return jsonify({
+            'status': 'Refreshing Ollama status and testing models',
+            'service_available': True,
+            'current_status': {'models': models, 'model_details': model_details, 'ollama_health': ollama_health.stats()}
+        })
+    else:
+        return jsonify({
+            'status': 'Ollama service is not available',
+            'message': 'Please make sure Ollama is installed and running: https://ollama.com/download'
+        }), 503
+
+# New route to specifically test the Mistral model
+@app.route('/api/test_mistral', methods=['GET'])
+def test_mistral_route():
+    """Test if the Mistral model is working properly"""
+    model_name = "mistral:latest"
+    
+    # Fail fast while Ollama is known to be down
+    if not ollama_health.allow():
+        return jsonify({
+            'status': 'error',
+            'message': "⚠️ Ollama service is not available. Please start Ollama and try again."
+        }), 503
+    
+    # Test Mistral model with a short prompt
+    model_working = test_model(model_name)
+    
+    if model_working:
+        return jsonify({
+            'status': 'success',
+            'message': f"✅ Model {model_name} is working properly",
+            'model_status': model_health.details(model_name)
+        })
+    else:
+        # Get details about the error
+        error = model_health.error(model_name)
+        
+        # Provide instructions based on error type
+        if "no such model" in str(error).lower() or "model not found" in str(error).lower():
+            message = f"⚠️ Model {model_name} is not installed. Please run: ollama pull {model_name}"
+        else:
+            message = f"⚠️ Model {model_name} is not working properly. Error: {error}"
+        
+        return jsonify({
+            'status': 'error',
+            'message': message,
+            'model_status': model_health.details(model_name),
+            'fix_command': f"ollama pull {model_name}"
+        }), 400
+
+# Disk quotas for uploaded files. Images still referenced by a chat session and PDFs
+# whose extraction or upload job is queued or running are never removed; extracted documents stay in the store.
+# Traces and profiles are only diagnostics and are trimmed the same way, as are cached
+# responses, which are only deleted on read once they expire.
+UPLOAD_MAX_BYTES = 2 * 1024 ** 3
+UPLOAD_MAX_AGE = 7 * 24 * 3600
+PDF_MAX_BYTES = 5 * 1024 ** 3
+PDF_MAX_AGE = 30 * 24 * 3600
+TRACE_MAX_BYTES = 512 * 1024 ** 2
+TRACE_MAX_AGE = 7 * 24 * 3600
+CACHE_MAX_BYTES = 1024 ** 3
+JANITOR_INTERVAL = 600
+
+def pdf_in_use(path):
+    """True while a PDF is being ingested or a queued or running upload job still needs it"""
+    name = os.path.basename(path)
+    if name.split('.')[0] in ingestions:
+        return True
+    return any(os.path.basename(payload['pdf_path']) == name
+               for payload in job_queue.active_payloads('pdf_upload'))
+
+# Set once create_app() has built the shared state below
+_app_created = False
+
+def create_app():
+    """Build the clients, stores and queues the routes share and start the background work
+    
+    Nothing is built on import: spawned extraction workers and the debug reloader's
+    watcher import this module too. Call once per serving process; returns the Flask app.
+    """
+    global _app_created, ollama_backends, model_residency, ollama_client, request_scheduler
+    global model_health, ollama_health, image_store, chat_histories, context_window
+    global response_cache, document_store, vector_index, document_analyzer, job_queue, janitor
+    if _app_created:
+        return app
+    _app_created = True
+    
+    tracing.configure(TRACE_FOLDER, min_duration=TRACE_MIN_SECONDS)
+    for folder in [UPLOAD_FOLDER, PDF_FOLDER, PROFILE_FOLDER]:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+    
+    # A single in-process fake stands in for every configured host
+    hosts = OLLAMA_HOSTS if OLLAMA_CLIENT == 'http' else OLLAMA_HOSTS[:1]
+    ollama_backends = [create_client(OLLAMA_CLIENT, host, timeout=OLLAMA_TIMEOUT, retries=OLLAMA_RETRIES)
+                       for host in hosts]
+    model_residency = ModelResidency(ollama_backends, PRELOAD_MODELS, keep_alive=MODEL_KEEP_ALIVE,
+                                     active_window=MODEL_ACTIVE_WINDOW)
+    ollama_client = BackendPool(ollama_backends, on_response=record_ollama_response)
+    
+    request_scheduler = RequestScheduler(
+        max_concurrent=OLLAMA_PARALLEL * len(ollama_backends),
+        model_limits={"llama3.2-vision:latest": VISION_PARALLEL * len(ollama_backends)},
+        max_queue=SCHEDULER_MAX_QUEUE,
+        max_wait=SCHEDULER_MAX_WAIT,
+        batch_size=SCHEDULER_BATCH
+    )
+    
+    # Model readiness, updated from request outcomes and the background prober
+    model_health = ModelHealth(REQUIRED_MODELS, ollama_client, probe_interval=MODEL_PROBE_INTERVAL,
+                               keep_alive=MODEL_KEEP_ALIVE)
+    ollama_health = ServiceHealth(
+        probe_ollama_service,
+        interval=OLLAMA_CHECK_INTERVAL,
+        failure_threshold=OLLAMA_FAILURE_THRESHOLD,
+        reset_timeout=OLLAMA_RESET_TIMEOUT,
+        max_reset_timeout=OLLAMA_MAX_RESET_TIMEOUT
+    )
+    
+    # Chat images are stored once per content hash and counted per message that references them
+    image_store = ImageStore(UPLOAD_FOLDER)
+    chat_histories = create_session_store(
+        SESSION_BACKEND,
+        ttl=SESSION_TTL,
+        max_bytes=SESSION_MAX_BYTES,
+        max_messages=SESSION_MAX_MESSAGES,
+        on_evict=lambda messages: image_store.release(message_images(messages)),
+        **({'path': 'sessions.db'} if SESSION_BACKEND == 'sqlite' else {})
+    )
+    # Sessions restored from disk still reference their images
+    image_store.acquire(message_images(chat_histories.all_messages()))
+    context_window = ContextWindow(CHAT_CONTEXT_TOKENS, summarizer=ollama_summarizer(scheduled_chat, CHAT_SUMMARY_MODEL))
+    
+    # Model responses for repeated prompts (in-memory LRU in front of cache/responses/)
+    response_cache = ResponseCache()
+    
+    # Extracted PDF documents, keyed by content hash, and an optional semantic index
+    # over all of them (needs NumPy and an embedding model)
+    document_store = DocumentStore()
+    vector_index = VectorIndex(OllamaEmbedder(ollama_client)) if vector_search_available() else None
+    document_analyzer = MapReduceSummarizer(
+        lambda prompt, key: cached_chat(ANALYSIS_MODEL, [{'role': 'user', 'content': prompt}], cache_key=key,
+                                        background=True)['content'],
+        ANALYSIS_MODEL, max_workers=ANALYSIS_WORKERS, section_chars=ANALYSIS_SECTION_CHARS
+    )
+    
+    job_queue = JobQueue(JOB_DB, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING)
+    job_queue.register('pdf_upload', run_pdf_job)
+    janitor = Janitor([
+        FolderQuota(UPLOAD_FOLDER, UPLOAD_MAX_BYTES, UPLOAD_MAX_AGE,
+                    can_delete=lambda path: not image_store.is_referenced(path)),
+        FolderQuota(PDF_FOLDER, PDF_MAX_BYTES, PDF_MAX_AGE, min_age=3600,
+                    can_delete=lambda path: not pdf_in_use(path)),
+        FolderQuota(TRACE_FOLDER, TRACE_MAX_BYTES, TRACE_MAX_AGE, min_age=0),
+        FolderQuota(PROFILE_FOLDER, TRACE_MAX_BYTES, TRACE_MAX_AGE, min_age=0),
+        FolderQuota(response_cache.folder, CACHE_MAX_BYTES, response_cache.ttl, recursive=True)
+    ], interval=JANITOR_INTERVAL)
+    
+    # Check Ollama in a separate thread, and resume upload jobs left from a restart
+    threading.Thread(target=initialize_ollama).start()
+    janitor.start()
+    job_queue.start()
+    return app
+
+if __name__ == '__main__':
+    # With the reloader this script runs in a watcher process and again in the child that
+    # serves requests (WERKZEUG_RUN_MAIN=true); only the child builds the app state
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        create_app()
+    logger.info("Starting Flask server...")
+    logger.info("Will check Ollama service availability in the background...")
+    logger.info("Server is starting on http://127.0.0.1:5000")
+    app.run(debug=True, port=5000)
\ No newline at end of file
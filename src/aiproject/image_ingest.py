@@ -0,0 +1,139 @@
+import os
+import base64
+import hashlib
+import shutil
+import tempfile
+import threading
+import logging
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Downscaling is optional; images are then stored as uploaded
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Longest side the vision model looks at; larger images only cost memory and bandwidth
+VISION_MAX_SIDE = 1120
+
+# Uploads smaller than this stay in memory until they are written out
+SPOOL_SIZE = 4 * 1024 * 1024
+
+
+def downscaling_available():
+    """Return True if Pillow is installed so images can be resized on upload."""
+    return Image is not None
+
+
+def decode_data_url(image_data):
+    """Decode a base64 image, with or without a data URL prefix, into a temporary file."""
+    # Remove the data URL prefix (e.g., "data:image/jpeg;base64,")
+    if ',' in image_data:
+        image_data = image_data.split(',', 1)[1]
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    spool.write(base64.b64decode(image_data))
+    spool.seek(0)
+    return spool
+
+
+def write_image(source, path, max_side=VISION_MAX_SIDE, chunk_size=256 * 1024):
+    """Write an image file to path, downscaled so its longest side is at most max_side.
+
+    JPEGs are decoded at reduced size when possible, which keeps the decoded
+    bitmap of a large photo small. Without Pillow the bytes are copied as is.
+    """
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    if Image is not None:
+        try:
+            with Image.open(source) as image:
+                image.draft('RGB', (max_side, max_side))
+                image = ImageOps.exif_transpose(image)
+                original_size = image.size
+                image.thumbnail((max_side, max_side))
+                image.convert('RGB').save(tmp_path, 'JPEG', quality=90)
+            os.replace(tmp_path, path)
+            logger.info(f"Image saved to {path} ({original_size[0]}x{original_size[1]} -> {image.size[0]}x{image.size[1]})")
+            return
+        except OSError as e:
+            logger.warning(f"⚠️ Could not downscale image, storing it unchanged: {e}")
+            source.seek(0)
+
+    with open(tmp_path, 'wb') as f:
+        shutil.copyfileobj(source, f, chunk_size)
+    os.replace(tmp_path, path)
+    logger.info(f"Image saved to {path}")
+
+
+class ImageStore:
+    """Chat images stored once per content hash, with reference counts.
+
+    Sessions acquire the images of the messages they hold and release them
+    when those messages are evicted; unreferenced images may then be removed
+    by the upload janitor.
+    """
+
+    def __init__(self, folder, max_side=VISION_MAX_SIDE):
+        self.folder = folder
+        self.max_side = max_side
+        self.counters = {'stored': 0, 'deduplicated': 0}
+        self._refs = {}
+        self._lock = threading.Lock()
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def add(self, stream, chunk_size=256 * 1024):
+        """Store an uploaded image and return its path; identical images are stored once.
+
+        The stream is hashed while it is copied in chunks into a spooled
+        buffer, so a large photo never sits in memory as one string and an
+        image that is already stored is not decoded again.
+        """
+        digest = hashlib.sha256()
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+            for block in iter(lambda: stream.read(chunk_size), b''):
+                digest.update(block)
+                spool.write(block)
+
+            path = os.path.join(self.folder, f"{digest.hexdigest()}.jpg")
+            try:
+                # Mark a stored copy as recently used, which also keeps the janitor off it
+                os.utime(path)
+                with self._lock:
+                    self.counters['deduplicated'] += 1
+                logger.info(f"Reusing stored image {path}")
+                return path
+            except FileNotFoundError:
+                pass
+
+            spool.seek(0)
+            write_image(spool, path, self.max_side, chunk_size)
+        with self._lock:
+            self.counters['stored'] += 1
+        return path
+
+    def acquire(self, paths):
+        with self._lock:
+            for path in paths:
+                self._refs[path] = self._refs.get(path, 0) + 1
+
+    def release(self, paths):
+        with self._lock:
+            for path in paths:
+                count = self._refs.get(path, 0) - 1
+                if count > 0:
+                    self._refs[path] = count
+                else:
+                    self._refs.pop(path, None)
+
+    def is_referenced(self, path):
+        with self._lock:
+            return path in self._refs
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, referenced=len(self._refs))
+
+
+def message_images(messages):
+    """Image paths attached to a list of chat messages."""
+    return [image for message in messages for image in message.get('images') or ()]
@@ -0,0 +1,104 @@
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FolderQuota:
+    """Size and age limits for the files in one folder.
+
+    Files older than max_age are removed, then the least recently modified
+    files until the folder fits in max_bytes. Files touched within min_age
+    (e.g. still being written or just reused) and files for which
+    can_delete(path) is False are always kept. With recursive, files in
+    subfolders count towards the quota too.
+    """
+
+    def __init__(self, folder, max_bytes=None, max_age=None, min_age=600, can_delete=None, recursive=False):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.min_age = min_age
+        self.can_delete = can_delete or (lambda path: True)
+        self.recursive = recursive
+
+    def _files(self):
+        files = []
+        folders = [self.folder]
+        while folders:
+            for entry in os.scandir(folders.pop()):
+                if entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+                elif self.recursive and entry.is_dir(follow_symlinks=False):
+                    folders.append(entry.path)
+        files.sort()
+        return files
+
+    def enforce(self, now=None):
+        """Delete files beyond the quota; returns (files removed, bytes freed)."""
+        now = now or time.time()
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        removed = freed = 0
+
+        # Oldest first, so the size quota drops the least recently used files
+        for mtime, size, path in files:
+            age = now - mtime
+            too_old = self.max_age is not None and age > self.max_age
+            too_big = self.max_bytes is not None and total > self.max_bytes
+            if not too_old and not too_big:
+                continue
+            if age < self.min_age or not self.can_delete(path):
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"⚠️ Could not remove {path}: {e}")
+                continue
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
+
+
+class Janitor:
+    """Background thread that periodically enforces folder quotas."""
+
+    def __init__(self, quotas, interval=600):
+        self.quotas = quotas
+        self.interval = interval
+        self.last_run = None
+        self.totals = {'files': 0, 'bytes': 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        for quota in self.quotas:
+            try:
+                removed, freed = quota.enforce()
+            except OSError as e:
+                logger.warning(f"⚠️ Could not clean up {quota.folder}: {e}")
+                continue
+            if removed:
+                logger.info(f"Removed {removed} files ({freed / 1024 / 1024:.1f} MB) from {quota.folder}")
+            self.totals['files'] += removed
+            self.totals['bytes'] += freed
+        self.last_run = time.time()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {'last_run': self.last_run, 'removed_files': self.totals['files'], 'removed_bytes': self.totals['bytes']}
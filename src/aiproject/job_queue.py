@@ -0,0 +1,192 @@
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when too many jobs are already waiting."""
+
+
+class JobQueue:
+    """Persistent background job queue run by a bounded pool of worker threads.
+
+    Jobs are stored in SQLite, so queued jobs survive a restart; jobs that
+    were running when the process stopped are queued again on start().
+    Handlers are registered per job kind and called as
+    handler(payload, report), where report(progress_dict) records progress.
+    """
+
+    def __init__(self, path='jobs.db', workers=2, max_pending=100, retention=7 * 24 * 3600):
+        self.path = path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self.handlers = {}
+        self._threads = []
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopping = False
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created);
+        """)
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def submit(self, kind, payload):
+        """Queue a job and return its id; raises QueueFull when the backlog is too long."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            pending, = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} jobs are already waiting")
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created, updated) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), now, now)
+            )
+            self._wakeup.notify()
+        logger.info(f"Queued {kind} job {job_id}")
+        return job_id
+
+    def get(self, job_id):
+        """Return a job as a dict, or None if it is unknown."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, status, payload, progress, result, error, created, updated FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row[2] == 'queued':
+                position, = self._db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created < ?", (row[7],)
+                ).fetchone()
+
+        return {
+            'id': row[0],
+            'kind': row[1],
+            'status': row[2],
+            'payload': json.loads(row[3]),
+            'progress': json.loads(row[4]) if row[4] else None,
+            'result': json.loads(row[5]) if row[5] else None,
+            'error': row[6],
+            'created': row[7],
+            'updated': row[8],
+            'queuePosition': position
+        }
+
+    def active_payloads(self, kind):
+        """Return the payloads of jobs of a kind that are queued or running."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payload FROM jobs WHERE kind = ? AND status IN ('queued', 'running')", (kind,)
+            ).fetchall()
+        return [json.loads(payload) for payload, in rows]
+
+    def _set(self, job_id, **fields):
+        fields['updated'] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _claim(self):
+        """Mark the oldest queued job as running and return (id, kind, payload), or None.
+
+        One statement, so two processes sharing the database never claim the same job.
+        """
+        with self._lock:
+            # fetchall() runs the statement to completion, which ends its implicit transaction
+            rows = self._db.execute(
+                """UPDATE jobs SET status = 'running', updated = ?
+                   WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1)
+                     AND status = 'queued'
+                   RETURNING id, kind, payload""",
+                (time.time(),)
+            ).fetchall()
+            if not rows:
+                return None
+            job_id, kind, payload = rows[0]
+            return job_id, kind, json.loads(payload)
+
+    def _run(self, job_id, kind, payload):
+        handler = self.handlers.get(kind)
+        if handler is None:
+            self._set(job_id, status='failed', error=f"No handler for job kind {kind}")
+            return
+
+        def report(progress):
+            self._set(job_id, progress=json.dumps(progress))
+
+        try:
+            result = handler(payload, report)
+            self._set(job_id, status='done', result=json.dumps(result))
+            logger.info(f"✅ Job {job_id} finished")
+        except Exception as e:
+            logger.error(f"❌ Job {job_id} failed: {e}")
+            self._set(job_id, status='failed', error=str(e))
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                job = self._claim()
+                while job is None and not self._stopping:
+                    self._wakeup.wait(timeout=5)
+                    job = self._claim()
+                if self._stopping:
+                    return
+            self._run(*job)
+
+    def _sweep(self):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                (time.time() - self.retention,)
+            )
+
+    def start(self):
+        """Requeue interrupted jobs and start the worker threads."""
+        with self._lock:
+            if self._threads:
+                return
+            requeued = self._db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+            if requeued:
+                logger.info(f"Requeued {requeued} interrupted jobs")
+            self._sweep()
+            self._stopping = False
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._worker, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {'workers': self.workers, 'max_pending': self.max_pending, 'jobs': counts}
@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import statistics
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_ollama import FakeOllamaServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_command(mode, port, workers):
+    """Command line that starts the API in the given serving mode."""
+    if mode == 'async':
+        return [sys.executable, os.path.join(HERE, 'async_server.py'), '--port', str(port)]
+    if mode == 'threaded':
+        # A single Flask process with a thread per request, like the development server
+        return [sys.executable, '-c', f"import flask_server; flask_server.create_app().run(port={port}, threaded=True)"]
+    # Flask with a fixed number of synchronous worker processes, like a sync gunicorn deployment
+    code = f"import flask_server; flask_server.create_app().run(port={port}, threaded=False, processes={workers})"
+    return [sys.executable, '-c', code]
+
+
+def scheduler_env(concurrency):
+    """Scheduler limits that let the server pass `concurrency` requests to the fake Ollama at once.
+
+    The defaults in flask_server.py are sized for a real GPU host and would turn most of a
+    load test into 429s, hiding the difference between serving modes.
+    """
+    return {
+        'OLLAMA_PARALLEL': str(concurrency),
+        'VISION_PARALLEL': str(concurrency),
+        'SCHEDULER_MAX_QUEUE': str(concurrency),
+    }
+
+
+def wait_until_ready(base_url, timeout=60):
+    """Wait until the server is up and its first health check has found Ollama.
+
+    Until then the circuit breaker is half-open and chat requests get a 503.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/status", timeout=2) as response:
+                if response.status == 200 and json.loads(response.read()).get('ollama_service'):
+                    return
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+def post_chat(base_url, i):
+    body = json.dumps({'text': f"Question {i}", 'sessionId': f"load-{i}",
+                       'model': 'llama3.2-vision:latest'}).encode('utf-8')
+    req = urllib.request.Request(f"{base_url}/api/chat", data=body,
+                                 headers={'Content-Type': 'application/json'})
+    start = time.time()
+    try:
+        with urllib.request.urlopen(req, timeout=600) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = None
+    return time.time() - start, status
+
+
+def run_scenario(mode, fake_url, requests_count, concurrency, workers):
+    """Start the API in one mode and fire concurrent /api/chat requests at it."""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, OLLAMA_HOST=fake_url, PYTHONPATH=HERE, **scheduler_env(concurrency))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process = subprocess.Popen(server_command(mode, port, workers), cwd=workdir, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(base_url)
+            start = time.time()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(lambda i: post_chat(base_url, i), range(requests_count)))
+            wall_time = time.time() - start
+        finally:
+            process.terminate()
+            process.wait()
+
+    latencies = sorted(latency for latency, status in results if status == 200)
+    rejected = sum(1 for _, status in results if status == 429)
+    return {
+        'mode': mode,
+        'requests': requests_count,
+        'succeeded': len(latencies),
+        'rejected': rejected,
+        'failed': len(results) - len(latencies) - rejected,
+        'concurrency': concurrency,
+        'wall_time': wall_time,
+        'throughput': len(latencies) / wall_time if wall_time else 0.0,
+        'p50': statistics.median(latencies) if latencies else None,
+        'p95': latencies[int(len(latencies) * 0.95) - 1] if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Flask and async serving under concurrent chats")
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8, help="Flask worker processes")
+    parser.add_argument('--latency', type=float, default=2.0, help="fake Ollama seconds per reply")
+    parser.add_argument('--modes', default='flask,async')
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    fake = FakeOllamaServer(latency=args.latency, tokens_per_second=0).start()
+    print(f"Fake Ollama on {fake.url} ({args.latency}s per reply)")
+
+    results = []
+    try:
+        for mode in args.modes.split(','):
+            result = run_scenario(mode, fake.url, args.requests, args.concurrency, args.workers)
+            results.append(result)
+            print(f"{mode:>6}: {result['succeeded']}/{result['requests']} ok, {result['rejected']} rejected (429), "
+                  f"{result['failed']} failed in {result['wall_time']:.1f}s, "
+                  f"{result['throughput']:.1f} req/s, p50 {result['p50'] or 0:.2f}s, p95 {result['p95'] or 0:.2f}s")
+    finally:
+        fake.stop()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
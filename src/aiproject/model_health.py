@@ -0,0 +1,149 @@
+import threading
+import time
+import logging
+
+from ollama_client import OllamaError
+
+logger = logging.getLogger(__name__)
+
+
+class ModelHealth:
+    """Tracks model readiness from real request outcomes plus a background prober.
+
+    Request handlers only call is_ready() and the mark_* methods, which are
+    cheap and lock-protected; the expensive checks against Ollama run in the
+    prober thread, and only while the service itself is up. Probes pass
+    keep_alive so they don't cut short how long Ollama keeps a model loaded.
+    """
+
+    def __init__(self, models, client, probe_interval=60, failure_threshold=3, keep_alive=None):
+        self.client = client
+        self._ready = {model_name: False for model_name in models}
+        self._model_details = {model_name: {"status": "unknown", "error": None} for model_name in models}
+        self.probe_interval = probe_interval
+        self.failure_threshold = failure_threshold
+        self.keep_alive = keep_alive
+        self._lock = threading.RLock()
+        self._failures = {}
+        self._last_success = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _details(self, model_name):
+        return self._model_details.setdefault(model_name, {"status": "unknown", "error": None})
+
+    def model_names(self):
+        """The models the application uses."""
+        with self._lock:
+            return list(self._ready)
+
+    def tracks(self, model_name):
+        with self._lock:
+            return model_name in self._ready
+
+    def snapshot(self):
+        """Return copies of (model -> ready, model -> status details) for /api/status."""
+        with self._lock:
+            return dict(self._ready), {name: dict(details) for name, details in self._model_details.items()}
+
+    def mark_available(self, model_name):
+        """Record that Ollama lists the model as installed."""
+        with self._lock:
+            details = self._details(model_name)
+            # Don't let a listing hide a model that is failing; the prober decides that
+            if details["status"] in ("unknown", "not_found"):
+                self._failures[model_name] = 0
+                self._ready[model_name] = True
+                details["status"] = "available"
+                details["error"] = None
+
+    def mark_working(self, model_name):
+        """Record a successful request to the model."""
+        with self._lock:
+            self._failures[model_name] = 0
+            self._last_success[model_name] = time.time()
+            self._ready[model_name] = True
+            details = self._details(model_name)
+            details["status"] = "working"
+            details["error"] = None
+
+    def mark_failed(self, model_name, error_msg, not_found=False):
+        """Record a failed request; the model stops being ready once missing or failing repeatedly."""
+        with self._lock:
+            failures = self._failures.get(model_name, 0) + 1
+            self._failures[model_name] = failures
+            details = self._details(model_name)
+            details["status"] = "not_found" if not_found else "error"
+            details["error"] = error_msg
+            if not_found or failures >= self.failure_threshold:
+                self._ready[model_name] = False
+
+    def set_error(self, model_name, error_msg):
+        """Record an error detail that says nothing about the model's health (e.g. context length)."""
+        with self._lock:
+            self._details(model_name)["error"] = error_msg
+
+    def is_ready(self, model_name):
+        """Return False only if the model is known to be missing or repeatedly failing."""
+        with self._lock:
+            details = self._model_details.get(model_name)
+            if details is None or details["status"] in ("unknown", "available", "working"):
+                return True
+            if details["status"] == "not_found":
+                return False
+            return self._failures.get(model_name, 0) < self.failure_threshold
+
+    def error(self, model_name):
+        with self._lock:
+            return self._details(model_name)["error"]
+
+    def details(self, model_name):
+        """Return a snapshot of the model's status details."""
+        with self._lock:
+            return dict(self._details(model_name))
+
+    def probe(self, model_name, timeout=120):
+        """Load the model without generating anything and record the outcome."""
+        try:
+            # An empty prompt makes Ollama load the model and return immediately
+            options = {'keep_alive': self.keep_alive} if self.keep_alive is not None else {}
+            self.client.load(model_name, timeout=timeout, **options)
+            self.mark_working(model_name)
+            return True
+        except OllamaError as e:
+            if e.status_code == 404:
+                self.mark_failed(model_name, f"Model {model_name} not found", not_found=True)
+                return False
+            self.mark_failed(model_name, str(e))
+            logger.warning(f"⚠️ Probe of model {model_name} failed: {e}")
+            return False
+
+    def _needs_probe(self, model_name):
+        with self._lock:
+            if self._details(model_name)["status"] == "not_found":
+                return False
+            last_success = self._last_success.get(model_name, 0)
+        return time.time() - last_success > self.probe_interval
+
+    def _run(self, service_available):
+        while not self._stop.is_set():
+            try:
+                if service_available():
+                    for model_name in self.model_names():
+                        # Models that served a real request recently need no probe
+                        if self._needs_probe(model_name):
+                            self.probe(model_name)
+            except Exception as e:
+                logger.error(f"Error in model health prober: {e}")
+            self._stop.wait(self.probe_interval)
+
+    def start(self, service_available):
+        """Start the background prober; models are only probed while service_available() is true."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(service_available,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
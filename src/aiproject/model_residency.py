@@ -0,0 +1,135 @@
+import time
+import threading
+import logging
+
+from ollama_client import OllamaError
+
+logger = logging.getLogger(__name__)
+
+
+class ModelResidency:
+    """Keeps the models users need loaded in Ollama so requests don't pay for a cold load.
+
+    The configured models are loaded on every host at startup. After that,
+    models that served traffic within active_window are pinged on each host
+    before their keep-alive runs out, while models nobody uses are left to
+    unload. warm() loads a model ahead of a request that is known to be
+    coming (e.g. the analysis model when a PDF upload starts). record()
+    reads Ollama's load_duration from each response to count cold starts.
+    """
+
+    def __init__(self, clients, models=(), keep_alive=1800, active_window=3600, interval=60, cold_threshold=1.0):
+        self.clients = clients
+        self.models = list(models)
+        self.keep_alive = keep_alive          # seconds Ollama keeps a model loaded after a request
+        self.active_window = active_window    # models used within this many seconds are kept warm
+        self.interval = interval
+        self.cold_threshold = cold_threshold  # load times above this count as a cold start
+        self._last_used = {}                  # model -> last request time
+        self._refreshed = {}                  # (host, model) -> last request or ping
+        self._warming = set()
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _model_metrics(self, model):
+        return self._metrics.setdefault(model, {
+            'requests': 0, 'cold_starts': 0, 'cold_start_seconds': 0.0,
+            'last_cold_start': None, 'warm_ups': 0, 'keep_alive_pings': 0
+        })
+
+    def record(self, host, model, response):
+        """Note a completed request; response is Ollama's final (or only) response object."""
+        load_seconds = (response.get('load_duration') or 0) / 1e9
+        now = time.time()
+        with self._lock:
+            self._last_used[model] = now
+            self._refreshed[(host, model)] = now
+            metrics = self._model_metrics(model)
+            metrics['requests'] += 1
+            if load_seconds < self.cold_threshold:
+                return
+            metrics['cold_starts'] += 1
+            metrics['cold_start_seconds'] += load_seconds
+            metrics['last_cold_start'] = load_seconds
+        logger.warning(f"⚠️ Cold start: loading {model} on {host} took {load_seconds:.1f}s")
+
+    def _load(self, client, model, kind):
+        started = time.time()
+        try:
+            client.load(model, keep_alive=self.keep_alive)
+        except OllamaError as e:
+            # Not installed on that host, or the host is down; the health checks report both
+            logger.debug(f"Could not load {model} on {client.host}: {e}")
+            return
+        with self._lock:
+            self._refreshed[(client.host, model)] = time.time()
+            self._model_metrics(model)[kind] += 1
+        logger.info(f"Model {model} is loaded on {client.host} ({time.time() - started:.1f}s)")
+
+    def warm(self, model, reason=None, wait=False):
+        """Load model on every host in the background, unless that is already under way."""
+        with self._lock:
+            if model in self._warming:
+                return
+            self._warming.add(model)
+            # Expected traffic keeps the model warm until the activity window passes
+            self._last_used[model] = max(self._last_used.get(model, 0), time.time())
+        if reason:
+            logger.info(f"Warming up {model} ({reason})")
+
+        def run():
+            try:
+                for client in self.clients:
+                    with self._lock:
+                        fresh = time.time() - self._refreshed.get((client.host, model), 0) < self.interval
+                    if not fresh:
+                        self._load(client, model, 'warm_ups')
+            finally:
+                with self._lock:
+                    self._warming.discard(model)
+
+        if wait:
+            run()
+        else:
+            threading.Thread(target=run, daemon=True).start()
+
+    def _due_pings(self, now):
+        # Ping with two check intervals to spare so the keep-alive never lapses in between
+        deadline = self.keep_alive - 2 * self.interval
+        with self._lock:
+            active = [m for m, used in self._last_used.items() if now - used <= self.active_window]
+            return [(client, model) for model in active for client in self.clients
+                    if model not in self._warming and now - self._refreshed.get((client.host, model), 0) > deadline]
+
+    def run_once(self):
+        for client, model in self._due_pings(time.time()):
+            self._load(client, model, 'keep_alive_pings')
+
+    def _run(self):
+        for model in self.models:
+            self.warm(model, 'startup', wait=True)
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error keeping models loaded: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return {
+                model: dict(metrics,
+                            active=now - self._last_used.get(model, 0) <= self.active_window,
+                            avg_cold_start=metrics['cold_start_seconds'] / metrics['cold_starts'] if metrics['cold_starts'] else None)
+                for model, metrics in self._metrics.items()
+            }
@@ -0,0 +1,267 @@
+"""Client for the Ollama HTTP API shared by the servers, the CLI and the background workers.
+
+All requests from a process go through one pooled keep-alive session, with
+timeouts and retries (exponential backoff) for connection failures and
+overloaded servers. Each request is a span of the current trace and
+carries its trace id in the X-Trace-Id header. FakeOllamaClient and
+AsyncFakeOllamaClient in fake_ollama.py implement the same methods
+in-process for tests and benchmarks; create_client() picks one or the other.
+"""
+import os
+import json
+import time
+import base64
+import asyncio
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+
+try:
+    import httpx
+except ImportError:  # Only the async client needs it; the Flask server and CLI use requests
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "http://localhost:11434"
+
+# Statuses worth retrying: the server is restarting or overloaded
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+
+class OllamaError(Exception):
+    """An Ollama request failed; status_code is None when the server was unreachable."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def normalize_host(host):
+    host = (host or DEFAULT_HOST).rstrip('/')
+    return host if '://' in host else f"http://{host}"
+
+
+def encode_images(messages):
+    """Replace image file paths in chat messages with the base64 data Ollama expects."""
+    encoded = []
+    for message in messages:
+        images = message.get('images')
+        if images:
+            message = dict(message, images=[_encode_image(image) for image in images])
+        encoded.append(message)
+    return encoded
+
+
+def _encode_image(image):
+    image = str(image)
+    if os.path.isfile(image):
+        with open(image, 'rb') as f:
+            return base64.b64encode(f.read()).decode('ascii')
+    return image
+
+
+def _trace_headers():
+    trace_id = tracing.current_trace_id()
+    return {tracing.TRACE_HEADER: trace_id} if trace_id else None
+
+
+def _error_message(status_code, body):
+    try:
+        return json.loads(body).get('error') or body
+    except (ValueError, AttributeError):
+        return body or f"HTTP {status_code}"
+
+
+class OllamaClient:
+    """Synchronous Ollama client over a pooled requests session."""
+
+    def __init__(self, host=None, timeout=300, connect_timeout=5, retries=2, backoff=0.5, pool_size=32):
+        self.host = normalize_host(host)
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _request(self, method, path, payload=None, stream=False, timeout=None):
+        # Streamed requests are timed until the response starts
+        with tracing.span(f"ollama {path}", host=self.host, model=(payload or {}).get('model')):
+            return self._request_with_retries(method, path, payload, stream, timeout)
+
+    def _request_with_retries(self, method, path, payload, stream, timeout):
+        url = f"{self.host}{path}"
+        headers = _trace_headers()
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(
+                    method, url, json=payload, stream=stream, headers=headers,
+                    timeout=(self.connect_timeout, timeout or self.timeout)
+                )
+                if response.status_code >= 400:
+                    message = _error_message(response.status_code, response.text)
+                    response.close()
+                    raise OllamaError(message, response.status_code)
+                return response
+            except requests.exceptions.ReadTimeout as e:
+                # The model may still be generating; retrying would start the work over
+                raise OllamaError(f"Ollama request to {path} timed out: {e}") from e
+            except (requests.exceptions.ConnectionError, OllamaError) as e:
+                retryable = not isinstance(e, OllamaError) or e.status_code in RETRY_STATUSES
+                if not retryable or attempt >= self.retries:
+                    if isinstance(e, OllamaError):
+                        raise
+                    raise OllamaError(f"Failed to connect to Ollama at {self.host}: {e}") from e
+                delay = self.backoff * 2 ** attempt
+                logger.warning(f"⚠️ Ollama request to {path} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def _stream(self, response):
+        with response:
+            try:
+                for line in response.iter_lines():
+                    if line:
+                        chunk = json.loads(line)
+                        if 'error' in chunk:
+                            raise OllamaError(chunk['error'])
+                        yield chunk
+            except requests.exceptions.RequestException as e:
+                raise OllamaError(f"Lost connection to Ollama: {e}") from e
+
+    def tags(self, timeout=5):
+        """Return the names of the models installed on the server."""
+        response = self._request('GET', '/api/tags', timeout=timeout)
+        return [model.get('name', '') for model in response.json().get('models', [])]
+
+    def ps(self, timeout=5):
+        """Return the names of the models currently loaded in memory."""
+        response = self._request('GET', '/api/ps', timeout=timeout)
+        return [model.get('name', '') for model in response.json().get('models', [])]
+
+    def chat(self, model, messages, stream=False, options=None, timeout=None, **extra):
+        """Chat completion; returns the response dict, or an iterator of chunks when streaming."""
+        payload = dict(extra, model=model, messages=encode_images(messages), stream=stream)
+        if options:
+            payload['options'] = options
+        response = self._request('POST', '/api/chat', payload, stream=stream, timeout=timeout)
+        return self._stream(response) if stream else response.json()
+
+    def generate(self, model, prompt, stream=False, options=None, timeout=None, **extra):
+        """Prompt completion; returns the response dict, or an iterator of chunks when streaming."""
+        payload = dict(extra, model=model, prompt=prompt, stream=stream)
+        if options:
+            payload['options'] = options
+        response = self._request('POST', '/api/generate', payload, stream=stream, timeout=timeout)
+        return self._stream(response) if stream else response.json()
+
+    def embed(self, model, inputs, timeout=None):
+        """Return one embedding vector per input text."""
+        response = self._request('POST', '/api/embed', {'model': model, 'input': inputs}, timeout=timeout)
+        return response.json()['embeddings']
+
+    def load(self, model, timeout=None, **extra):
+        """Load a model into memory without generating anything."""
+        return self.generate(model, '', timeout=timeout, **extra)
+
+
+def create_client(kind=None, host=None, asynchronous=False, **options):
+    """Return an Ollama client of the given kind (OLLAMA_CLIENT by default).
+
+    'http' talks to the Ollama server at host, 'fake' answers in-process with
+    canned replies (fake_ollama.py). asynchronous picks the asyncio flavour;
+    options go to the HTTP client's constructor.
+    """
+    kind = kind or os.environ.get('OLLAMA_CLIENT', 'http')
+    if kind == 'fake':
+        from fake_ollama import AsyncFakeOllamaClient, FakeOllamaClient
+        return AsyncFakeOllamaClient() if asynchronous else FakeOllamaClient()
+    if kind != 'http':
+        raise ValueError(f"Unknown Ollama client {kind!r} (expected 'http' or 'fake')")
+    return (AsyncOllamaClient if asynchronous else OllamaClient)(host, **options)
+
+
+class AsyncOllamaClient:
+    """asyncio counterpart of OllamaClient over a pooled httpx connection pool."""
+
+    def __init__(self, host=None, timeout=300, connect_timeout=5, retries=2, backoff=0.5, max_connections=500):
+        if httpx is None:
+            raise ImportError("AsyncOllamaClient requires httpx (pip install httpx)")
+        self.host = normalize_host(host)
+        self.retries = retries
+        self.backoff = backoff
+        self.http = httpx.AsyncClient(
+            base_url=self.host,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def _send(self, method, path, payload=None, stream=False):
+        with tracing.span(f"ollama {path}", host=self.host, model=(payload or {}).get('model')):
+            return await self._send_with_retries(method, path, payload, stream)
+
+    async def _send_with_retries(self, method, path, payload, stream):
+        headers = _trace_headers()
+        attempt = 0
+        while True:
+            try:
+                request = self.http.build_request(method, path, json=payload, headers=headers)
+                response = await self.http.send(request, stream=stream)
+                if response.status_code >= 400:
+                    body = (await response.aread()).decode('utf-8', 'replace')
+                    await response.aclose()
+                    raise OllamaError(_error_message(response.status_code, body), response.status_code)
+                return response
+            except httpx.ReadTimeout as e:
+                raise OllamaError(f"Ollama request to {path} timed out: {e}") from e
+            except (httpx.TransportError, OllamaError) as e:
+                retryable = not isinstance(e, OllamaError) or e.status_code in RETRY_STATUSES
+                if not retryable or attempt >= self.retries:
+                    if isinstance(e, OllamaError):
+                        raise
+                    raise OllamaError(f"Failed to connect to Ollama at {self.host}: {e}") from e
+                delay = self.backoff * 2 ** attempt
+                logger.warning(f"⚠️ Ollama request to {path} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _stream(self, response):
+        try:
+            async for line in response.aiter_lines():
+                if line:
+                    chunk = json.loads(line)
+                    if 'error' in chunk:
+                        raise OllamaError(chunk['error'])
+                    yield chunk
+        except httpx.TransportError as e:
+            raise OllamaError(f"Lost connection to Ollama: {e}") from e
+        finally:
+            await response.aclose()
+
+    async def tags(self):
+        response = await self._send('GET', '/api/tags')
+        return [model.get('name', '') for model in response.json().get('models', [])]
+
+    async def chat(self, model, messages, stream=False, options=None, **extra):
+        payload = dict(extra, model=model, messages=encode_images(messages), stream=stream)
+        if options:
+            payload['options'] = options
+        response = await self._send('POST', '/api/chat', payload, stream=stream)
+        return self._stream(response) if stream else response.json()
+
+    async def generate(self, model, prompt, stream=False, options=None, **extra):
+        payload = dict(extra, model=model, prompt=prompt, stream=stream)
+        if options:
+            payload['options'] = options
+        response = await self._send('POST', '/api/generate', payload, stream=stream)
+        return self._stream(response) if stream else response.json()
+
+    async def aclose(self):
+        await self.http.aclose()
@@ -0,0 +1,157 @@
+import os
+import time
+import multiprocessing
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PAGE_SECONDS = metrics.histogram(
+    'pdf_page_extraction_seconds', 'Time to extract one PDF page',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+# Documents shorter than this are extracted in-process; a pool isn't worth it
+MIN_PAGES_PER_WORKER = 32
+
+# Table detection is by far the slowest part of structured extraction, so it is opt-in
+# (PDF_DETECT_TABLES=1). Read from the environment so spawned workers see the same setting.
+DETECT_TABLES = os.environ.get('PDF_DETECT_TABLES') == '1'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers=None):
+    """Return the shared extraction process pool, creating it on first use.
+
+    Workers are spawned rather than forked: the server is multithreaded, and a
+    forked worker could inherit a lock some other thread was holding.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _rect(bbox):
+    return [round(coord, 1) for coord in bbox]
+
+
+def find_tables(page):
+    """Return the tables PyMuPDF detects on a page as {'bbox', 'rows'} dicts."""
+    finder = getattr(page, 'find_tables', None)   # PyMuPDF 1.23+
+    if finder is None or not DETECT_TABLES:
+        return []
+    try:
+        return [{'bbox': _rect(table.bbox), 'rows': table.extract()} for table in finder().tables]
+    except Exception as e:
+        logger.debug(f"Table detection failed on page {page.number + 1}: {e}")
+        return []
+
+
+def read_page(page, structured=True):
+    """Return a page as a dict: its text, plus its layout when structured.
+
+    The layout is the page size, the text blocks as [x0, y0, x1, y1, text],
+    the detected tables and the embedded images with their bounding boxes,
+    all in PDF points.
+    """
+    if not structured:
+        return {'text': page.get_text()}
+    blocks = [[*_rect(block[:4]), block[4]] for block in page.get_text('blocks') if block[6] == 0]
+    return {
+        'text': "".join(block[4] for block in blocks),
+        'size': _rect((page.rect.width, page.rect.height)),
+        'blocks': blocks,
+        'tables': find_tables(page),
+        'images': [{'xref': image.get('xref', 0), 'bbox': _rect(image['bbox']),
+                    'width': image['width'], 'height': image['height']}
+                   for image in page.get_image_info(xrefs=True)]
+    }
+
+
+def extract_page(doc, page_num, structured=True):
+    """Return (page, seconds) for one page of an open document; see read_page()."""
+    started = time.perf_counter()
+    page = read_page(doc.load_page(page_num), structured)
+    return page, time.perf_counter() - started
+
+
+def extract_page_range(pdf_path, start, end, structured=True):
+    """Extract pages [start, end) in this process; each worker opens its own document.
+
+    Returns (start, [(page, seconds), ...]) so the parent can record page timings.
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        return start, [extract_page(doc, page_num, structured) for page_num in range(start, end)]
+    finally:
+        doc.close()
+
+
+def page_ranges(total_pages, workers, min_pages=MIN_PAGES_PER_WORKER):
+    """Split pages into contiguous ranges, a few per worker so fast workers pick up slack."""
+    chunk = max(min_pages, -(-total_pages // (workers * 4)))
+    return [(start, min(start + chunk, total_pages)) for start in range(0, total_pages, chunk)]
+
+
+def count_pages(pdf_path):
+    doc = fitz.open(pdf_path)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def iter_pages(pdf_path, workers=None, structured=True):
+    """Yield (page_index, page) in page order as pages are extracted; see read_page().
+
+    Large documents are extracted in parallel, but only a couple of page
+    ranges per worker are in flight at once, so memory stays bounded to that
+    window rather than the whole document.
+    """
+    total_pages = count_pages(pdf_path)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or total_pages < MIN_PAGES_PER_WORKER * 2:
+        doc = fitz.open(pdf_path)
+        try:
+            for page_num in range(total_pages):
+                page, seconds = extract_page(doc, page_num, structured)
+                PAGE_SECONDS.observe(seconds)
+                yield page_num, page
+        finally:
+            doc.close()
+        return
+
+    pool = get_pool(workers)
+    ranges = iter(page_ranges(total_pages, workers))
+    in_flight = deque()
+
+    def submit_next():
+        page_range = next(ranges, None)
+        if page_range is not None:
+            in_flight.append(pool.submit(extract_page_range, pdf_path, *page_range, structured))
+
+    for _ in range(workers * 2):
+        submit_next()
+    try:
+        while in_flight:
+            # Ranges are consumed in submission order, which is page order
+            start, pages = in_flight.popleft().result()
+            submit_next()
+            for offset, (page, seconds) in enumerate(pages):
+                PAGE_SECONDS.observe(seconds)
+                yield start + offset, page
+    finally:
+        for future in in_flight:
+            future.cancel()
@@ -0,0 +1,110 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_FOLDER = os.path.join('cache', 'responses')
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Collapse whitespace and case so trivially different prompts share a cache entry."""
+    return WHITESPACE.sub(" ", text or "").strip().casefold()
+
+
+def make_key(*parts):
+    """Hash arbitrary JSON-serializable key parts into a cache key."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def chat_key(model_name, messages, options=None):
+    """Cache key for a chat completion over a list of messages."""
+    normalized = [
+        (m.get('role'), normalize_text(m.get('content')), [str(image) for image in m.get('images') or ()])
+        for m in messages
+    ]
+    return make_key('chat', model_name, normalized, options or {})
+
+
+class ResponseCache:
+    """Two-tier cache of model responses: an in-memory LRU in front of JSON files on disk."""
+
+    def __init__(self, folder=CACHE_FOLDER, max_entries=1000, ttl=7 * 24 * 3600):
+        self.folder = folder
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0}
+        self._memory = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], f"{key}.json")
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached response for a key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return entry[1]
+            if entry:
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+            if record['expires_at'] > now:
+                with self._lock:
+                    self._remember(key, record['expires_at'], record['value'])
+                    self.counters['disk_hits'] += 1
+                return record['value']
+            os.remove(path)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        with self._lock:
+            self.counters['misses'] += 1
+        return None
+
+    def put(self, key, value):
+        """Store a response in both tiers."""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.counters['stores'] += 1
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'expires_at': expires_at, 'value': value}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write response cache entry: {e}")
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            counters['memory_entries'] = len(self._memory)
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+        counters['hit_rate'] = (counters['memory_hits'] + counters['disk_hits']) / lookups if lookups else 0.0
+        return counters
@@ -0,0 +1,159 @@
+import re
+import math
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Very common English words carry no retrieval signal
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have if in into is it its of on or
+that the their then there these this to was were what when where which who why
+will with how does do can about
+""".split())
+
+
+def tokenize(text):
+    """Lowercase a string and split it into index terms."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text):
+    """Rough model token count (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def chunk_pages(pages, chunk_size=1200, overlap=200, first_page=1):
+    """Split page texts into overlapping chunks that never cross a page boundary."""
+    chunks = []
+    step = max(chunk_size - overlap, 1)
+    for page_num, page_text in enumerate(pages, start=first_page):
+        page_text = page_text.strip()
+        start = 0
+        while start < len(page_text):
+            end = min(start + chunk_size, len(page_text))
+            # Prefer to cut at whitespace so words are not split in half
+            if end < len(page_text):
+                cut = page_text.rfind(" ", start + step, end)
+                if cut != -1:
+                    end = cut
+            chunks.append({'page': page_num, 'text': page_text[start:end]})
+            if end == len(page_text):
+                break
+            start = max(end - overlap, start + 1)
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 lexical index over a list of text chunks.
+
+    Chunks can be appended with add() while the index is already being
+    searched, e.g. as pages of a document are still being extracted.
+    """
+
+    def __init__(self, chunks=(), k1=1.5, b=0.75):
+        self.chunks = []
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = []
+        self.doc_freqs = Counter()
+        self.lengths = []
+        self.total_length = 0
+        self.avg_length = 0.0
+        self.idf = {}
+        self._stale = False
+        self._lock = threading.Lock()
+        self.add(chunks)
+
+    def add(self, chunks):
+        """Append chunks to the index; statistics are refreshed on the next search."""
+        for chunk in chunks:
+            terms = Counter(tokenize(chunk['text']))
+            with self._lock:
+                self.term_freqs.append(terms)
+                self.lengths.append(sum(terms.values()))
+                self.total_length += self.lengths[-1]
+                self.doc_freqs.update(terms.keys())
+                self.chunks.append(chunk)
+                self._stale = True
+
+    def _refresh(self):
+        with self._lock:
+            if self._stale:
+                n = len(self.chunks)
+                self.avg_length = self.total_length / n if n else 0.0
+                self.idf = {
+                    term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+                    for term, df in self.doc_freqs.items()
+                }
+                self._stale = False
+            return len(self.chunks), self.idf, self.avg_length
+
+    def search(self, query, top_k=8):
+        """Return (score, chunk index) pairs for the best matching chunks."""
+        # Score against a consistent snapshot even if chunks are being added
+        n, idf, avg_length = self._refresh()
+        query_terms = [t for t in set(tokenize(query)) if t in idf]
+        if not query_terms or not n:
+            return []
+
+        scores = []
+        for i in range(n):
+            terms = self.term_freqs[i]
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / (avg_length or 1))
+            score = 0.0
+            for term in query_terms:
+                tf = terms.get(term)
+                if tf:
+                    score += idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores.append((score, i))
+
+        scores.sort(reverse=True)
+        return scores[:top_k]
+
+    def select(self, query, token_budget=2000, top_k=8, hits=None):
+        """Pick the best chunks that fit in a token budget, returned in document order.
+
+        ``hits`` overrides the BM25 ranking, e.g. with fused lexical and vector results.
+        """
+        if hits is None:
+            hits = self.search(query, top_k)
+        if not hits:
+            # Nothing matched lexically; fall back to the start of the document
+            hits = [(0.0, i) for i in range(min(top_k, len(self.chunks)))]
+
+        selected = []
+        used = 0
+        for _, i in hits:
+            cost = estimate_tokens(self.chunks[i]['text'])
+            if used + cost > token_budget:
+                continue
+            selected.append(i)
+            used += cost
+
+        return [self.chunks[i] for i in sorted(selected)]
+
+
+def fuse_rankings(*rankings, k=60):
+    """Merge several ranked lists of chunk indexes with reciprocal rank fusion."""
+    scores = Counter()
+    for ranking in rankings:
+        for rank, chunk_index in enumerate(ranking):
+            scores[chunk_index] += 1.0 / (k + rank + 1)
+    return [(score, i) for i, score in scores.most_common()]
+
+
+def build_index(pages, chunk_size=1200, overlap=200):
+    """Chunk a document's pages and build a BM25 index over them."""
+    chunks = chunk_pages(pages, chunk_size, overlap)
+    logger.info(f"Indexed {len(chunks)} chunks from {len(pages)} pages")
+    return BM25Index(chunks)
+
+
+def format_context(chunks):
+    """Render selected chunks as page-labelled excerpts for a prompt."""
+    return "\n\n".join(f"[Page {chunk['page']}]\n{chunk['text']}" for chunk in chunks)
@@ -0,0 +1,231 @@
+import math
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+WAIT_SECONDS = metrics.histogram('scheduler_wait_seconds', 'Time a request waited for a model slot', ['model'])
+
+
+class Overloaded(Exception):
+    """Raised when a model's queue is full or a request waited too long for a slot."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A request's place in the scheduler; granted when it may call Ollama."""
+
+    def __init__(self, scheduler, model, session):
+        self.scheduler = scheduler
+        self.model = model
+        self.session = session
+        self.state = 'queued'
+        self.enqueued = time.time()
+        self.granted_at = None
+        self._granted = threading.Event()
+        self._callbacks = []
+
+    def wait(self, timeout=None):
+        """Block until granted; raises Overloaded (and leaves the queue) after timeout seconds."""
+        if self._granted.wait(timeout):
+            return
+        if self.scheduler._timed_out(self):
+            logger.warning(f"⚠️ Request for {self.model} gave up after waiting {timeout}s for a slot")
+            raise Overloaded(f"Model {self.model} is busy", self.scheduler.retry_after(self.model))
+
+    def on_grant(self, callback):
+        """Call callback() once the ticket is granted (right away if it already is)."""
+        with self.scheduler._lock:
+            if self.state == 'queued':
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def release(self):
+        """Give the slot back, or leave the queue if the ticket was never granted."""
+        self.scheduler._release(self)
+
+
+class RequestScheduler:
+    """Admission control and fair scheduling of model requests in front of Ollama.
+
+    At most max_concurrent requests run at once, and at most model_limits[m]
+    of them for model m. Waiting requests are queued per model and, within a
+    model, taken round-robin across sessions so one busy session cannot crowd
+    out the others. Requests for the model that is already running are
+    preferred, up to batch_size in a row while another model waits, so
+    interleaved traffic does not make Ollama swap models on every request.
+    A model with max_queue requests waiting turns new ones away (admit()
+    raises Overloaded with a retry hint).
+    """
+
+    def __init__(self, max_concurrent=2, model_limits=None, max_queue=32, max_wait=120, batch_size=8):
+        self.max_concurrent = max_concurrent
+        self.model_limits = model_limits or {}
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.batch_size = batch_size
+        self.current = None       # model most recently started
+        self.swaps = 0
+        self._batch = 0
+        self._queues = {}         # model -> OrderedDict(session -> deque of tickets)
+        self._running = {}
+        self._counters = {}
+        self._service_time = {}   # model -> moving average of seconds per request
+        self._lock = threading.Lock()
+
+    def _limit(self, model):
+        return min(self.model_limits.get(model, self.max_concurrent), self.max_concurrent)
+
+    def _queued(self, model):
+        return sum(len(tickets) for tickets in self._queues.get(model, {}).values())
+
+    def _count(self, model, name, amount=1):
+        counters = self._counters.setdefault(model, {'served': 0, 'rejected': 0, 'timeouts': 0, 'wait_total': 0.0})
+        counters[name] += amount
+
+    def _retry_after(self, model):
+        service_time = self._service_time.get(model, 10.0)
+        return max(1, math.ceil(service_time * (self._queued(model) + 1) / self._limit(model)))
+
+    def retry_after(self, model):
+        """Seconds until a new request for model would likely get a slot."""
+        with self._lock:
+            return self._retry_after(model)
+
+    def admit(self, model):
+        """Raise Overloaded if model already has max_queue requests waiting."""
+        with self._lock:
+            if self._queued(model) < self.max_queue:
+                return
+            self._count(model, 'rejected')
+            retry_after = self._retry_after(model)
+        logger.warning(f"⚠️ Queue for {model} is full, rejecting request (retry in {retry_after}s)")
+        raise Overloaded(f"Model {model} is busy", retry_after)
+
+    def submit(self, model, session=None):
+        """Queue a request and return its Ticket; it may be granted immediately."""
+        ticket = Ticket(self, model, session)
+        with self._lock:
+            sessions = self._queues.setdefault(model, OrderedDict())
+            sessions.setdefault(session, deque()).append(ticket)
+            self._dispatch()
+        return ticket
+
+    @contextmanager
+    def slot(self, model, session=None, background=False):
+        """Hold a slot for model for the duration of the with block.
+
+        Interactive requests give up with Overloaded after max_wait seconds;
+        background work waits as long as it takes.
+        """
+        ticket = self.submit(model, session)
+        try:
+            with tracing.span('scheduler_wait', model=model):
+                ticket.wait(None if background else self.max_wait)
+            yield ticket
+        finally:
+            ticket.release()
+
+    def _next_model(self):
+        waiting = [m for m, sessions in self._queues.items()
+                   if sessions and self._running.get(m, 0) < self._limit(m)]
+        if not waiting:
+            return None
+        others_waiting = any(sessions for m, sessions in self._queues.items() if m != self.current)
+        if self.current in waiting and (self._batch < self.batch_size or not others_waiting):
+            self._batch += 1
+            return self.current
+
+        # Switch to the model whose oldest request has waited longest
+        candidates = [m for m in waiting if m != self.current] or waiting
+        model = min(candidates, key=lambda m: min(tickets[0].enqueued for tickets in self._queues[m].values()))
+        if self.current is not None and model != self.current:
+            self.swaps += 1
+            logger.info(f"Switching scheduled requests from {self.current} to {model}")
+        self.current = model
+        self._batch = 1
+        return model
+
+    def _dispatch(self):
+        while sum(self._running.values()) < self.max_concurrent:
+            model = self._next_model()
+            if model is None:
+                return
+            # Round-robin across sessions: take the first session's oldest request, then move it to the back
+            sessions = self._queues[model]
+            session, tickets = next(iter(sessions.items()))
+            ticket = tickets.popleft()
+            if tickets:
+                sessions.move_to_end(session)
+            else:
+                del sessions[session]
+            self._grant(ticket)
+
+    def _grant(self, ticket):
+        ticket.state = 'granted'
+        ticket.granted_at = time.time()
+        self._running[ticket.model] = self._running.get(ticket.model, 0) + 1
+        self._count(ticket.model, 'wait_total', ticket.granted_at - ticket.enqueued)
+        WAIT_SECONDS.observe(ticket.granted_at - ticket.enqueued, model=ticket.model)
+        ticket._granted.set()
+        for callback in ticket._callbacks:
+            callback()
+
+    def _remove(self, ticket):
+        sessions = self._queues.get(ticket.model, {})
+        tickets = sessions.get(ticket.session)
+        if tickets is not None and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del sessions[ticket.session]
+
+    def _timed_out(self, ticket):
+        """Drop a ticket that is still queued; returns False if it was granted meanwhile."""
+        with self._lock:
+            if ticket.state != 'queued':
+                return False
+            self._remove(ticket)
+            ticket.state = 'done'
+            self._count(ticket.model, 'timeouts')
+            return True
+
+    def _release(self, ticket):
+        with self._lock:
+            if ticket.state == 'queued':
+                self._remove(ticket)
+            elif ticket.state == 'granted':
+                self._running[ticket.model] -= 1
+                self._count(ticket.model, 'served')
+                elapsed = time.time() - ticket.granted_at
+                previous = self._service_time.get(ticket.model)
+                self._service_time[ticket.model] = elapsed if previous is None else 0.8 * previous + 0.2 * elapsed
+            ticket.state = 'done'
+            self._dispatch()
+
+    def stats(self):
+        with self._lock:
+            models = {}
+            for model in set(self._queues) | set(self._running) | set(self._counters):
+                counters = self._counters.get(model, {'served': 0, 'rejected': 0, 'timeouts': 0, 'wait_total': 0.0})
+                granted = counters['served'] + self._running.get(model, 0)
+                models[model] = {
+                    'queued': self._queued(model),
+                    'running': self._running.get(model, 0),
+                    'limit': self._limit(model),
+                    'served': counters['served'],
+                    'rejected': counters['rejected'],
+                    'timeouts': counters['timeouts'],
+                    'avg_wait': counters['wait_total'] / granted if granted else 0.0,
+                    'avg_service_time': self._service_time.get(model)
+                }
+            return {'current_model': self.current, 'swaps': self.swaps, 'models': models}
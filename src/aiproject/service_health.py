@@ -0,0 +1,162 @@
+import math
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'        # the service is up; requests go through
+OPEN = 'open'            # the service is down; requests fail fast until the next trial probe
+HALF_OPEN = 'half_open'  # a trial probe is deciding; requests still fail fast
+
+
+class ServiceHealth:
+    """Background health monitor with circuit-breaker semantics for the Ollama service.
+
+    Request handlers only call allow(), which reads the breaker state and
+    never blocks. The breaker opens when a probe fails, or when requests
+    report failure_threshold connection failures in a row via
+    record_failure(). After reset_timeout the monitor thread goes half-open
+    and runs the probe as the trial call: success closes the breaker, failure
+    opens it again with the timeout doubled, up to max_reset_timeout. While
+    closed, the monitor re-probes every interval seconds. The breaker starts
+    half-open, since nothing is known until the first probe.
+    """
+
+    def __init__(self, probe, interval=30, failure_threshold=2, reset_timeout=5, max_reset_timeout=60):
+        self.probe = probe                    # raises if the service is unreachable
+        self.interval = interval
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._state = HALF_OPEN
+        self._timeout = reset_timeout         # current open period, doubled after each failed trial
+        self._opened_at = None
+        self._failures = 0                    # consecutive connection failures reported by requests
+        self._last_check = None
+        self._last_error = None
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()   # one probe at a time
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    @property
+    def last_check(self):
+        with self._lock:
+            return self._last_check
+
+    def allow(self):
+        """True if requests may go to Ollama; False means fail fast."""
+        with self._lock:
+            return self._state == CLOSED
+
+    def _retry_after(self, now):
+        if self._state == OPEN:
+            return max(1, math.ceil(self._opened_at + self._timeout - now))
+        return 0 if self._state == CLOSED else 1
+
+    def retry_after(self):
+        """Seconds until the service may be reachable again (0 while the breaker is closed)."""
+        with self._lock:
+            return self._retry_after(time.time())
+
+    def _open(self, error, now):
+        if self._state == HALF_OPEN and self._opened_at is not None:
+            # A failed trial: wait longer before the next one
+            self._timeout = min(self._timeout * 2, self.max_reset_timeout)
+        self._state = OPEN
+        self._opened_at = now
+        self._last_error = str(error)
+        logger.error(f"❌ Cannot connect to Ollama service, failing requests fast for {self._timeout}s: {error}")
+
+    def _close(self):
+        if self._state != CLOSED:
+            logger.info("✅ Ollama service is running")
+        self._state = CLOSED
+        self._timeout = self.reset_timeout
+        self._opened_at = None
+        self._failures = 0
+        self._last_error = None
+
+    def record_success(self):
+        """Report a request that Ollama answered; closes the breaker if it was open."""
+        with self._lock:
+            self._failures = 0
+            if self._state != CLOSED:
+                self._close()
+
+    def record_failure(self, error):
+        """Report a request that could not reach Ollama."""
+        with self._lock:
+            self._failures += 1
+            if self._state != CLOSED or self._failures < self.failure_threshold:
+                return
+            self._open(error, time.time())
+        # The monitor may be sleeping for a full interval; let it schedule the trial probe
+        self._wake.set()
+
+    def check_now(self):
+        """Run the probe in the calling thread and update the breaker; returns True if the service is up."""
+        with self._probe_lock:
+            with self._lock:
+                if self._state == OPEN:
+                    self._state = HALF_OPEN
+            try:
+                self.probe()
+            except Exception as e:
+                with self._lock:
+                    self._last_check = time.time()
+                    self._open(e, self._last_check)
+                return False
+            with self._lock:
+                self._last_check = time.time()
+                self._close()
+            return True
+
+    def _next_probe_in(self):
+        with self._lock:
+            now = time.time()
+            if self._state == OPEN:
+                return self._opened_at + self._timeout - now
+            if self._state == HALF_OPEN:
+                return 0
+            return (self._last_check or 0) + self.interval - now
+
+    def _run(self):
+        while not self._stop.is_set():
+            delay = self._next_probe_in()
+            if delay > 0:
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+            try:
+                self.check_now()
+            except Exception as e:
+                logger.error(f"Error in Ollama health monitor: {e}")
+                self._stop.wait(self.reset_timeout)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'available': self._state == CLOSED,
+                'consecutive_failures': self._failures,
+                'last_check': self._last_check,
+                'last_error': self._last_error,
+                'retry_after': self._retry_after(time.time())
+            }
@@ -0,0 +1,344 @@
+import json
+import time
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def message_size(message):
+    """Approximate memory/disk footprint of a chat message in bytes."""
+    return len(json.dumps(message, default=str))
+
+
+def to_plain_message(message):
+    """Convert an Ollama message (dict or response object) to a plain dict."""
+    if isinstance(message, dict):
+        return dict(message)
+    plain = {'role': message['role'], 'content': message['content']}
+    images = getattr(message, 'images', None)
+    if images:
+        plain['images'] = [str(image) for image in images]
+    return plain
+
+
+class SessionStore:
+    """Interface for chat history storage with bounded size.
+
+    Sessions expire after ttl seconds without access, each session keeps at most
+    max_messages (oldest dropped first), and the least recently used sessions are
+    evicted while the total size exceeds max_bytes. on_evict(messages), if
+    given, is called with every message that leaves the store this way or
+    through reset(), e.g. to release the images they reference.
+    """
+
+    backend = None
+
+    def __init__(self, ttl=24 * 3600, max_bytes=64 * 1024 * 1024, max_messages=200, on_evict=None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.on_evict = on_evict
+        self.evictions = {'ttl': 0, 'lru': 0, 'trimmed_messages': 0}
+        self._lock = threading.RLock()
+
+    def get(self, session_id):
+        """Return a copy of the session's messages ([] for unknown sessions)."""
+        raise NotImplementedError
+
+    def append(self, session_id, message):
+        """Add a message to a session, creating the session if needed."""
+        raise NotImplementedError
+
+    def reset(self, session_id):
+        """Clear a session's messages; returns False if the session doesn't exist."""
+        raise NotImplementedError
+
+    def __contains__(self, session_id):
+        raise NotImplementedError
+
+    def all_messages(self):
+        """Return every stored message, e.g. to rebuild reference counts at startup."""
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    def _evicted(self, messages):
+        if self.on_evict and messages:
+            try:
+                self.on_evict(messages)
+            except Exception as e:
+                logger.warning(f"⚠️ Eviction callback failed: {e}")
+
+
+class MemorySessionStore(SessionStore):
+    """In-process session store with LRU order kept by an OrderedDict."""
+
+    backend = 'memory'
+
+    def __init__(self, max_sessions=10000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> {'messages', 'sizes', 'bytes', 'last_access'}
+        self._total_bytes = 0
+
+    def _drop(self, session_id, reason):
+        session = self._sessions.pop(session_id)
+        self._total_bytes -= session['bytes']
+        self.evictions[reason] += 1
+        self._evicted(session['messages'])
+
+    def _expire(self, now):
+        # The OrderedDict is in access order, so expired sessions are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session['last_access'] <= self.ttl:
+                break
+            self._drop(session_id, 'ttl')
+
+    def _touch(self, session_id, now):
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if now - session['last_access'] > self.ttl:
+            self._drop(session_id, 'ttl')
+            return None
+        session['last_access'] = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._touch(session_id, time.time())
+            return list(session['messages']) if session else []
+
+    def append(self, session_id, message):
+        message = to_plain_message(message)
+        size = message_size(message)
+        now = time.time()
+        with self._lock:
+            session = self._touch(session_id, now)
+            if session is None:
+                session = {'messages': [], 'sizes': [], 'bytes': 0, 'last_access': now}
+                self._sessions[session_id] = session
+
+            session['messages'].append(message)
+            session['sizes'].append(size)
+            session['bytes'] += size
+            self._total_bytes += size
+
+            while len(session['messages']) > self.max_messages:
+                self._evicted([session['messages'].pop(0)])
+                dropped = session['sizes'].pop(0)
+                session['bytes'] -= dropped
+                self._total_bytes -= dropped
+                self.evictions['trimmed_messages'] += 1
+
+            self._expire(now)
+            # Evict least recently used sessions, never the one being written
+            while self._sessions and (self._total_bytes > self.max_bytes or len(self._sessions) > self.max_sessions):
+                oldest = next(iter(self._sessions))
+                if oldest == session_id:
+                    break
+                self._drop(oldest, 'lru')
+
+    def reset(self, session_id):
+        with self._lock:
+            session = self._touch(session_id, time.time())
+            if session is None:
+                return False
+            self._total_bytes -= session['bytes']
+            self._evicted(session['messages'])
+            session.update(messages=[], sizes=[], bytes=0)
+            return True
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return self._touch(session_id, time.time()) is not None
+
+    def all_messages(self):
+        with self._lock:
+            return [message for session in self._sessions.values() for message in session['messages']]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'sessions': len(self._sessions),
+                'messages': sum(len(s['messages']) for s in self._sessions.values()),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': dict(self.evictions)
+            }
+
+
+class SqliteSessionStore(SessionStore):
+    """Disk-backed session store so histories survive restarts without living in RAM."""
+
+    backend = 'sqlite'
+
+    def __init__(self, path='sessions.db', sweep_interval=60, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL,
+                bytes INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                body TEXT NOT NULL,
+                bytes INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, seq);
+            CREATE INDEX IF NOT EXISTS sessions_by_access ON sessions (last_access);
+        """)
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM sessions").fetchone()[0]
+        self._pending_evictions = None   # messages evicted in the open transaction, reported on commit
+
+    def _evicted(self, messages):
+        if self._pending_evictions is not None:
+            self._pending_evictions.extend(messages)
+        else:
+            super()._evicted(messages)
+
+    def _delete_session(self, session_id, reason=None):
+        row = self._db.execute("SELECT bytes FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return
+        self._evicted(self._session_messages(session_id))
+        self._db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        self._total_bytes -= row[0]
+        if reason:
+            self.evictions[reason] += 1
+
+    def _session_messages(self, session_id):
+        if not self.on_evict:
+            return []
+        rows = self._db.execute("SELECT body FROM messages WHERE session_id = ? ORDER BY seq", (session_id,))
+        return [json.loads(body) for (body,) in rows]
+
+    def _alive(self, session_id, now):
+        row = self._db.execute("SELECT last_access FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return False
+        if now - row[0] > self.ttl:
+            self._delete_session(session_id, 'ttl')
+            return False
+        return True
+
+    def _sweep(self, now):
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            expired = self._db.execute("SELECT id FROM sessions WHERE last_access < ?", (now - self.ttl,)).fetchall()
+            for (session_id,) in expired:
+                self._delete_session(session_id, 'ttl')
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            if not self._alive(session_id, now):
+                return []
+            self._db.execute("UPDATE sessions SET last_access = ? WHERE id = ?", (now, session_id))
+            rows = self._db.execute("SELECT body FROM messages WHERE session_id = ? ORDER BY seq", (session_id,))
+            return [json.loads(body) for (body,) in rows]
+
+    def append(self, session_id, message):
+        message = to_plain_message(message)
+        body = json.dumps(message, default=str)
+        size = len(body)
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._pending_evictions = []
+            try:
+                self._alive(session_id, now)
+                self._db.execute(
+                    "INSERT INTO sessions (id, last_access, bytes) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET last_access = excluded.last_access, bytes = bytes + excluded.bytes",
+                    (session_id, now, size)
+                )
+                self._db.execute("INSERT INTO messages (session_id, body, bytes) VALUES (?, ?, ?)", (session_id, body, size))
+                self._total_bytes += size
+
+                # Keep only the newest max_messages messages of this session
+                overflow = self._db.execute(
+                    "SELECT seq, bytes, body FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT -1 OFFSET ?",
+                    (session_id, self.max_messages)
+                ).fetchall()
+                if overflow:
+                    dropped = sum(b for _, b, _ in overflow)
+                    self._evicted([json.loads(body) for _, _, body in overflow])
+                    self._db.executemany("DELETE FROM messages WHERE seq = ?", [(seq,) for seq, _, _ in overflow])
+                    self._db.execute("UPDATE sessions SET bytes = bytes - ? WHERE id = ?", (dropped, session_id))
+                    self._total_bytes -= dropped
+                    self.evictions['trimmed_messages'] += len(overflow)
+
+                self._sweep(now)
+                while self._total_bytes > self.max_bytes:
+                    row = self._db.execute(
+                        "SELECT id FROM sessions WHERE id != ? ORDER BY last_access LIMIT 1", (session_id,)
+                    ).fetchone()
+                    if row is None:
+                        break
+                    self._delete_session(row[0], 'lru')
+                self._db.execute("COMMIT")
+            except Exception:
+                self._pending_evictions = None
+                self._db.execute("ROLLBACK")
+                self._total_bytes = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM sessions").fetchone()[0]
+                raise
+            # Only messages that are really gone release their references
+            evicted, self._pending_evictions = self._pending_evictions, None
+            self._evicted(evicted)
+
+    def reset(self, session_id):
+        with self._lock:
+            if not self._alive(session_id, time.time()):
+                return False
+            row = self._db.execute("SELECT bytes FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            self._evicted(self._session_messages(session_id))
+            self._db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._db.execute("UPDATE sessions SET bytes = 0, last_access = ? WHERE id = ?", (time.time(), session_id))
+            self._total_bytes -= row[0]
+            return True
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return self._alive(session_id, time.time())
+
+    def all_messages(self):
+        with self._lock:
+            return [json.loads(body) for (body,) in self._db.execute("SELECT body FROM messages")]
+
+    def stats(self):
+        with self._lock:
+            sessions, = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()
+            messages, = self._db.execute("SELECT COUNT(*) FROM messages").fetchone()
+            return {
+                'backend': self.backend,
+                'sessions': sessions,
+                'messages': messages,
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': dict(self.evictions)
+            }
+
+
+def create_session_store(backend='memory', **kwargs):
+    """Build the session store for a backend name ('memory' or 'sqlite')."""
+    if backend == 'sqlite':
+        return SqliteSessionStore(**kwargs)
+    if backend == 'memory':
+        return MemorySessionStore(**kwargs)
+    raise ValueError(f"Unknown session store backend: {backend}")
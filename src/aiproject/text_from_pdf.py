@@ -1,7 +1,11 @@
 import os
-import sys
-import fitz  # PyMuPDF
-import requests
+import argparse
+import tracing
+from pdf_extraction import count_pages, iter_pages
+from document_store import DocumentStore, hash_file
+from document_analysis import MapReduceSummarizer
+from response_cache import ResponseCache
+from ollama_client import OllamaError, create_client
 import tkinter as tk
 from tkinter import filedialog
 import json
@@ -26,81 +30,84 @@ def select_pdf_file():
 
 def extract_text_from_pdf(pdf_path):
     """Extract text from a PDF file using PyMuPDF (fitz)."""
+    return "".join(extract_pages_from_pdf(pdf_path))
+
+def extract_pages_from_pdf(pdf_path, store=None):
+    """Extract the text of each page of a PDF file using PyMuPDF (fitz).
+    
+    The pages are kept in the document store under the file's hash, so
+    later runs on the same PDF don't extract it again.
+    """
+    store = store or DocumentStore()
+    document_id = hash_file(pdf_path)
+    if document_id in store:
+        print(f"Using the stored extraction of {os.path.basename(pdf_path)}")
+        return store.pages(document_id)
+    
     print(f"Extracting text from: {os.path.basename(pdf_path)}")
-    text = ""
+    
+    def print_progress(pages_done, total_pages):
+        progress = pages_done / total_pages * 100
+        print(f"Progress: {progress:.1f}% (Page {pages_done}/{total_pages})", end="\r")
+    
     try:
-        # Open the PDF
-        doc = fitz.open(pdf_path)
-        total_pages = len(doc)
-        
-        print(f"PDF has {total_pages} pages")
+        # Large documents are split across a process pool
+        total_pages = count_pages(pdf_path)
+        with tracing.span('extraction', file=os.path.basename(pdf_path)):
+            with store.writer(document_id, {'filename': os.path.basename(pdf_path)}) as writer:
+                for page_num, page in iter_pages(pdf_path):
+                    writer.add_page(page)
+                    print_progress(page_num + 1, total_pages)
+        pages = store.pages(document_id)
+        print(f"\nPDF has {len(pages)} pages")
         
-        # Extract text from each page
-        for page_num in range(total_pages):
-            page = doc.load_page(page_num)
-            page_text = page.get_text()
-            text += page_text
-            
-            # Print progress
-            progress = (page_num + 1) / total_pages * 100
-            print(f"Progress: {progress:.1f}% (Page {page_num + 1}/{total_pages})", end="\r")
-            
         # Complete the progress line
-        print("\nText extraction complete!")
-        
-        # Close the document
-        doc.close()
-        return text
+        print("Text extraction complete!")
+        return pages
     except Exception as e:
         print(f"\nError extracting text from PDF: {e}")
-        return ""
+        return []
 
-def get_initial_analysis(text, api_endpoint="http://localhost:11434/api/generate", model="mistral:latest"):
-    """Get the initial analysis of the PDF text from Mistral."""
+def get_initial_analysis(pages, client, model="mistral:latest", workers=4):
+    """Get the initial analysis of the whole PDF from Mistral.
+    
+    Sections of the document are summarized in parallel and then merged.
+    Section summaries are cached on disk, so analyzing an edited document
+    again only sends the sections that changed.
+    """
     print(f"\nGetting initial analysis with {model}...")
-    print(f"Sending {len(text)} characters to the model")
+    print(f"Sending {sum(len(page) for page in pages)} characters to the model in sections")
     
-    # Prepare the prompt for the initial analysis
-    prompt = f"""
-    I have extracted text from a PDF document. Please:
-    1. Identify the document type
-    2. Summarize the key points
-    3. Extract any important dates, names, or numerical data
+    cache = ResponseCache()
     
-    Here is the extracted text:
-    {text[:10000]}  # Sending first 10000 chars to avoid token limits
-    """
+    def complete(prompt, cache_key):
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        text = client.generate(model, prompt)["response"]
+        cache.put(cache_key, text)
+        return text
     
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False
-    }
+    def print_progress(stage, done, total):
+        print(f"Analysis {stage}: {done}/{total} sections", end="\r")
     
     try:
         # Start timing
         start_time = time.time()
         
-        # Send the request to the Ollama API
-        print("Sending request to Mistral model...")
-        response = requests.post(api_endpoint, json=payload)
+        print("Sending requests to Mistral model...")
+        with tracing.span('analysis', model=model, pages=len(pages)):
+            analysis = MapReduceSummarizer(complete, model, max_workers=workers).summarize(pages, progress=print_progress)
         
         # Calculate processing time
         processing_time = time.time() - start_time
-        
-        # Check if request was successful
-        if response.status_code == 200:
-            result = response.json()
-            print(f"Analysis complete! (Took {processing_time:.2f} seconds)")
-            return result
-        else:
-            print(f"Error: API returned status code {response.status_code}")
-            return {"error": f"API error: {response.status_code}", "text": response.text}
+        print(f"\nAnalysis complete! (Took {processing_time:.2f} seconds)")
+        return {"response": analysis}
     except Exception as e:
         print(f"Error connecting to Mistral model: {e}")
         return {"error": str(e)}
 
-def ask_questions_about_pdf(text, api_endpoint="http://localhost:11434/api/generate", model="mistral:latest"):
+def ask_questions_about_pdf(text, client, model="mistral:latest"):
     """Allow the user to ask questions about the PDF content."""
     print("\n" + "="*80)
     print("ASK QUESTIONS ABOUT THE PDF")
@@ -135,33 +142,18 @@ def ask_questions_about_pdf(text, api_endpoint="http://localhost:11434/api/gener
         Please provide a clear and direct answer based only on the information in the document.
         """
         
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "stream": False
-        }
-        
         try:
             # Send the request to the Ollama API
             print("Sending question to Mistral model...")
-            response = requests.post(api_endpoint, json=payload)
+            with tracing.span('question', model=model):
+                result = client.generate(model, prompt)
             
-            # Check if request was successful
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Display the answer
-                print("\n" + "="*80)
-                print("ANSWER:")
-                print("="*80)
-                
-                if "response" in result:
-                    print(result["response"])
-                else:
-                    print(f"Error processing question: {json.dumps(result, indent=2)}")
-            else:
-                print(f"Error: API returned status code {response.status_code}")
-        except Exception as e:
+            # Display the answer
+            print("\n" + "="*80)
+            print("ANSWER:")
+            print("="*80)
+            print(result["response"])
+        except OllamaError as e:
             print(f"Error processing question: {e}")
 
 def display_initial_analysis(text, analysis_result):
@@ -183,23 +175,26 @@ def display_initial_analysis(text, analysis_result):
     else:
         print(f"Error in processing: {json.dumps(analysis_result, indent=2)}")
 
-def main():
+def run():
     # Display welcome message
     print("PDF Analyzer with Mistral".center(80, "="))
     print("This tool extracts text from a PDF, analyzes it, and answers your questions")
     print("="*80 + "\n")
     
+    # One pooled client for every request (honours OLLAMA_HOST and OLLAMA_CLIENT like the server)
+    client = create_client(host=os.environ.get('OLLAMA_HOST'))
+    
     # Check if Ollama is running
     try:
-        health_check = requests.get("http://localhost:11434/api/tags")
-        if health_check.status_code != 200:
-            print("Warning: Ollama API doesn't seem to be responding correctly.")
-            print("Make sure Ollama is running with: ollama serve")
-    except requests.exceptions.ConnectionError:
-        print("Error: Cannot connect to Ollama API.")
-        print("Please start Ollama with: ollama serve")
-        print("Then run this script again.")
-        return
+        client.tags()
+    except OllamaError as e:
+        if e.status_code is None:
+            print("Error: Cannot connect to Ollama API.")
+            print("Please start Ollama with: ollama serve")
+            print("Then run this script again.")
+            return
+        print("Warning: Ollama API doesn't seem to be responding correctly.")
+        print("Make sure Ollama is running with: ollama serve")
         
     # Get the file path
     print("Please select a PDF file...")
@@ -210,14 +205,15 @@ def main():
         return
     
     # Extract text from the PDF
-    text = extract_text_from_pdf(pdf_path)
+    pages = extract_pages_from_pdf(pdf_path)
+    text = "".join(pages)
     
     if not text:
         print("No text extracted. Exiting.")
         return
     
-    # Get initial analysis from Mistral
-    initial_analysis = get_initial_analysis(text)
+    # Get initial analysis of the whole document from Mistral
+    initial_analysis = get_initial_analysis(pages, client)
     
     # Display the initial analysis
     display_initial_analysis(text, initial_analysis)
@@ -228,7 +224,7 @@ def main():
     
     if ask_questions == 'y':
         # Allow user to ask questions about the PDF
-        ask_questions_about_pdf(text)
+        ask_questions_about_pdf(text, client)
     
     # Ask if the user wants to save the results
     save_choice = input("\nDo you want to save the extracted text and initial analysis to files? (y/n): ").lower()
@@ -255,5 +251,29 @@ def main():
     
     print("\nThank you for using the PDF Analyzer!")
 
+def main():
+    parser = argparse.ArgumentParser(description="Extract, analyze and ask questions about a PDF with Mistral")
+    parser.add_argument('--trace-dir', default='traces',
+                        help="folder for the JSON trace of this run (empty to disable)")
+    parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'],
+                        help="profile the run and save the report in the trace folder")
+    args = parser.parse_args()
+    
+    # The whole run is one trace; extraction, analysis and every Ollama request are spans in it
+    tracing.configure(args.trace_dir or None)
+    profiler = tracing.Profiler(args.profile) if args.profile else None
+    if profiler and not profiler.start():
+        profiler = None
+    
+    with tracing.trace('text_from_pdf', export=True) as span:
+        try:
+            run()
+        finally:
+            if profiler:
+                path = profiler.save(args.trace_dir or '.', f"{span.trace.trace_id}-{span.span_id}")
+                print(f"Profile written to {path}")
+    if args.trace_dir:
+        print(f"Trace written to {os.path.join(args.trace_dir, f'{span.trace.trace_id}-{span.span_id}.json')}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,268 @@
+"""Span-based tracing of requests, jobs and CLI runs, with optional profiling.
+
+Each HTTP request, background job or CLI run is a trace; span() blocks
+inside it record where the time went. The current span lives in a context
+variable, so log records carry the trace id (see TraceIdFilter) and Ollama
+requests send it in the X-Trace-Id header. Work handed to another thread
+stays in the trace when the callable is wrapped with in_context(). When a
+trace's root span ends, the trace is written to the export folder as JSON.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+import contextvars
+import logging
+from contextlib import contextmanager
+
+try:
+    from pyinstrument import Profiler as Pyinstrument
+except ImportError:  # Optional sampling profiler; cProfile is always available
+    Pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = 'X-Trace-Id'
+PROFILE_HEADER = 'X-Profile'
+
+# Trace ids end up in file names and log lines, so only plain hex (or dashed UUID) ids are accepted
+_TRACE_ID_PATTERN = re.compile(r'^(?:[0-9a-f]{16,32}|[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12})$')
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+# Export settings, set once with configure()
+_export = {'folder': None, 'min_duration': 0.0}
+
+
+def configure(folder=None, min_duration=0.0):
+    """Write finished traces to folder (None disables export), if they took at least min_duration seconds."""
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    _export['folder'] = folder
+    _export['min_duration'] = min_duration
+
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+
+def valid_trace_id(trace_id):
+    """Return trace_id if it is a safe hex/UUID id, otherwise a fresh one (e.g. for untrusted headers)."""
+    if isinstance(trace_id, str) and _TRACE_ID_PATTERN.match(trace_id.lower()):
+        return trace_id.lower()
+    return new_trace_id()
+
+
+class Trace:
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        with self._lock:
+            self.spans.append(span.to_dict())
+
+
+class Span:
+    def __init__(self, trace, name, parent=None, attributes=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.thread = threading.current_thread().name
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+        self._started = time.perf_counter()
+        self._previous = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self, error=None):
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.trace.record(self)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'spanId': self.span_id,
+            'parentId': self.parent_id,
+            'thread': self.thread,
+            'start': self.start,
+            'duration': self.duration,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+
+def current_span():
+    return _current_span.get()
+
+
+def current_trace_id():
+    span = _current_span.get()
+    return span.trace.trace_id if span is not None else None
+
+
+def begin(name, trace_id=None, **attributes):
+    """Start a new trace and make its root span current; pair with end().
+
+    For code that cannot wrap the work in a with block, e.g. request hooks.
+    A trace_id that is not a hex/UUID id is replaced by a fresh one.
+    """
+    span = Span(Trace(valid_trace_id(trace_id)), name, attributes=attributes)
+    span._previous = _current_span.get()
+    _current_span.set(span)
+    return span
+
+
+def end(span, error=None, export=False):
+    """Finish a root span from begin(), restore the previous span and export the trace."""
+    span.finish(error)
+    _current_span.set(span._previous)
+    folder = _export['folder']
+    if folder and (export or span.duration >= _export['min_duration']):
+        _write(folder, span)
+
+
+def _write(folder, root):
+    path = os.path.join(folder, f"{root.trace.trace_id}-{root.span_id}.json")
+    with root.trace._lock:
+        spans = sorted(root.trace.spans, key=lambda span: span['start'])
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'traceId': root.trace.trace_id,
+                'name': root.name,
+                'start': root.start,
+                'duration': root.duration,
+                'spans': spans
+            }, f, indent=1)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not write trace {path}: {e}")
+
+
+@contextmanager
+def trace(name, trace_id=None, export=False, **attributes):
+    """Run the with block as a trace, continuing trace_id if given (e.g. from a request)."""
+    span = begin(name, trace_id, **attributes)
+    error = None
+    try:
+        yield span
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        end(span, error, export)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Record the with block as a child of the current span; does nothing outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent, attributes)
+    _current_span.set(child)
+    error = None
+    try:
+        yield child
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.set(parent)
+        child.finish(error)
+
+
+def in_context(fn):
+    """Bind fn to the current span so it stays in the trace when run on another thread."""
+    parent = _current_span.get()
+
+    def run(*args, **kwargs):
+        previous = _current_span.get()
+        _current_span.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_span.set(previous)
+    return run
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds the current trace id to log records as %(trace_id)s."""
+
+    def filter(self, record):
+        record.trace_id = current_trace_id() or '-'
+        return True
+
+
+def install_log_filter(target=None):
+    """Add TraceIdFilter to every handler of target (the root logger by default)."""
+    for handler in (target or logging.getLogger()).handlers:
+        handler.addFilter(TraceIdFilter())
+
+
+# Only one profile runs at a time: Python 3.12+ rejects a second active cProfile profiler
+_profiling = threading.Lock()
+
+
+class Profiler:
+    """Profiles one request or CLI run on the current thread.
+
+    kind 'pyinstrument' uses the pyinstrument sampling profiler when it is
+    installed and writes an HTML report; otherwise cProfile writes a .prof
+    file plus a text summary of the most expensive calls. While another
+    profile is running, start() returns False and nothing is profiled.
+    """
+
+    def __init__(self, kind='cprofile'):
+        self.kind = 'pyinstrument' if kind == 'pyinstrument' and Pyinstrument is not None else 'cprofile'
+        self._profiler = Pyinstrument() if self.kind == 'pyinstrument' else cProfile.Profile()
+
+    def start(self):
+        """Start profiling; returns False if another profile is already running."""
+        if not _profiling.acquire(blocking=False):
+            return False
+        try:
+            if self.kind == 'pyinstrument':
+                self._profiler.start()
+            else:
+                self._profiler.enable()
+        except BaseException:
+            _profiling.release()
+            raise
+        return True
+
+    def save(self, folder, name):
+        """Stop profiling and write the report; returns its path."""
+        try:
+            if self.kind == 'pyinstrument':
+                self._profiler.stop()
+            else:
+                self._profiler.disable()
+        finally:
+            _profiling.release()
+
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        base = os.path.join(folder, name)
+        if self.kind == 'pyinstrument':
+            with open(f"{base}.html", 'w', encoding='utf-8') as f:
+                f.write(self._profiler.output_html())
+            return f"{base}.html"
+
+        self._profiler.dump_stats(f"{base}.prof")
+        with open(f"{base}.txt", 'w', encoding='utf-8') as f:
+            pstats.Stats(self._profiler, stream=f).sort_stats('cumulative').print_stats(40)
+        return f"{base}.prof"
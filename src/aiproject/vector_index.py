@@ -0,0 +1,201 @@
+import os
+import json
+import zlib
+import bisect
+import threading
+import logging
+
+from retrieval import tokenize
+
+try:
+    import numpy as np
+except ImportError:  # Vector search is optional; BM25 still works without NumPy
+    np = None
+
+logger = logging.getLogger(__name__)
+
+VECTOR_FOLDER = 'vectors'
+EMBED_MODEL = 'nomic-embed-text'
+
+
+def vector_search_available():
+    """Return True if NumPy is installed so the vector index can be used."""
+    return np is not None
+
+
+class OllamaEmbedder:
+    """Embeds texts in batches through the Ollama /api/embed endpoint."""
+
+    def __init__(self, client, model=EMBED_MODEL, batch_size=32, timeout=60):
+        self.client = client
+        self.model = model
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            vectors.extend(self.client.embed(self.model, batch, timeout=self.timeout))
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class HashingEmbedder:
+    """Local stand-in for the Ollama embedder using feature-hashed term counts."""
+
+    def __init__(self, dim=256):
+        self.model = f"hashing-{dim}"
+        self.dim = dim
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in tokenize(text):
+                matrix[row, zlib.crc32(term.encode('utf-8')) % self.dim] += 1.0
+        return matrix
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorIndex:
+    """Chunk embeddings for all documents in one memory-mapped float32 matrix.
+
+    Rows are appended per document, so each document owns a contiguous row
+    range. Rows are L2-normalized on insert, which makes cosine similarity a
+    single matrix-vector product. The chunk index and page of every row are
+    appended to an int32 sidecar next to the matrix; meta.json only holds the
+    row range of each document and is written last, so it decides which rows
+    are committed.
+    """
+
+    def __init__(self, embedder, folder=VECTOR_FOLDER):
+        self.embedder = embedder
+        self.folder = folder
+        self.matrix_path = os.path.join(folder, 'vectors.f32')
+        self.rows_path = os.path.join(folder, 'rows.i32')
+        self.meta_path = os.path.join(folder, 'meta.json')
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._rows = None
+        self._starts = []        # first row of each document, ascending
+        self._owners = []        # document id for each entry of _starts
+        self._embedding = set()  # documents whose chunks are being embedded right now
+        self.meta = {'model': embedder.model, 'dim': None, 'count': 0, 'documents': {}}
+
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('model') != self.embedder.model:
+            logger.warning(f"Vector index was built with {meta.get('model')}, rebuilding for {self.embedder.model}")
+            return
+        self.meta = meta
+        ranges = sorted((start, document_id) for document_id, (start, _) in meta['documents'].items())
+        self._starts = [start for start, _ in ranges]
+        self._owners = [document_id for _, document_id in ranges]
+        self._remap()
+
+    def _remap(self):
+        if self.meta['count']:
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode='r',
+                                     shape=(self.meta['count'], self.meta['dim']))
+            self._rows = np.memmap(self.rows_path, dtype=np.int32, mode='r', shape=(self.meta['count'], 2))
+        else:
+            self._matrix = None
+            self._rows = None
+
+    def _save_meta(self):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    @staticmethod
+    def _truncate(path, size):
+        # Drop anything past the committed rows, e.g. left by a crash before meta.json was saved
+        with open(path, 'ab') as f:
+            f.truncate(size)
+
+    def __contains__(self, document_id):
+        return document_id in self.meta['documents']
+
+    def is_embedding(self, document_id):
+        """Return True while add() is embedding the document."""
+        with self._lock:
+            return document_id in self._embedding
+
+    def add(self, document_id, chunks):
+        """Embed a document's chunks and append them to the matrix.
+
+        Does nothing if the document is already indexed or another add() is embedding it.
+        """
+        if not chunks:
+            return
+        with self._lock:
+            if document_id in self or document_id in self._embedding:
+                return
+            self._embedding.add(document_id)
+        try:
+            vectors = _normalize(self.embedder.embed([chunk['text'] for chunk in chunks]))
+            rows = np.asarray([[i, chunk['page']] for i, chunk in enumerate(chunks)], dtype=np.int32)
+            self._append(document_id, vectors, rows)
+        finally:
+            with self._lock:
+                self._embedding.discard(document_id)
+        logger.info(f"Embedded {len(chunks)} chunks for document {document_id[:12]}")
+
+    def _append(self, document_id, vectors, rows):
+        with self._lock:
+            if self.meta['dim'] is None:
+                self.meta['dim'] = int(vectors.shape[1])
+            start = self.meta['count']
+            self._truncate(self.matrix_path, start * self.meta['dim'] * 4)
+            self._truncate(self.rows_path, start * 2 * 4)
+            with open(self.matrix_path, 'ab') as f:
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            with open(self.rows_path, 'ab') as f:
+                f.write(rows.tobytes())
+            self.meta['count'] = start + len(rows)
+            self.meta['documents'][document_id] = [start, self.meta['count']]
+            self._save_meta()
+            self._starts.append(start)
+            self._owners.append(document_id)
+            self._remap()
+
+    def search(self, query, top_k=8, document_id=None):
+        """Return (score, document id, chunk index, page) tuples for the nearest chunks."""
+        with self._lock:
+            matrix, rows = self._matrix, self._rows
+            starts, owners = self._starts, self._owners
+            offset = 0
+            if document_id is not None:
+                if document_id not in self:
+                    return []
+                offset, end = self.meta['documents'][document_id]
+                matrix = matrix[offset:end]
+        if matrix is None or not len(matrix):
+            return []
+
+        query_vector = _normalize(self.embedder.embed([query]))[0]
+        scores = matrix @ query_vector
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for i in top:
+            row = offset + int(i)
+            owner = document_id or owners[bisect.bisect_right(starts, row) - 1]
+            chunk_index, page = rows[row]
+            results.append((float(scores[i]), owner, int(chunk_index), int(page)))
+        return results